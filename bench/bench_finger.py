@@ -0,0 +1,242 @@
+"""Protocol path benchmark of the fingerprint reader.
+
+Runs finger_reader against simulated terminals (see fkterm.py) served
+from a separate process, and reports for each read:
+
+  records/s   log records decoded per second
+  reqs        requests the terminal answered (round trips)
+  conns       connections the terminal accepted
+  peak KiB    peak memory allocated by the reader (tracemalloc)
+
+Terminals of 1k, 10k and 100k records are read plain, with a delay
+before each reply, with replies cut in small chunks and with a terminal
+that closes the connection after every reply.
+
+--check follows a log growing from 40 to 3000 records on a terminal
+that sends pages of 1024 bytes at most, reading from the saved cursor
+each time, and compares with a full read.
+
+  python bench/bench_finger.py
+  python bench/bench_finger.py --records 10000 --users 300 --scenario plain
+  python bench/bench_finger.py --check
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, '..', 'custom_components', 'hass-fwiot'))
+
+import fkterm
+from finger.finger import finger_reader
+from finger.helper import fk_pool, PAGE_SIZE
+from finger.log import decode_logs, finger_log, LOG_SIZE
+
+SCENARIOS = {
+    'plain': {},
+    'latency': {'latency': 0.002},
+    'short': {'chunk': 100},
+    'drop': {'drop_every': 1},
+}
+''' fault injected in terminal, by name '''
+
+
+def _serve(kwargs, ready, requests, connections):
+    term = fkterm.terminal(**kwargs)
+
+    async def run():
+        server = await fkterm.serve(term)
+        ready.put(server.sockets[0].getsockname()[1])
+        while True:
+            requests.value = term.requests
+            connections.value = term.connections
+            await asyncio.sleep(0.005)
+
+    asyncio.run(run())
+
+
+class remote_terminal():
+      '''
+      simulated terminal running in its own process, so its work and
+      memory are not counted with the reader
+      '''
+      def __init__(self, **kwargs):
+          self.requests = multiprocessing.Value('q', 0)
+          self.connections = multiprocessing.Value('q', 0)
+          ready = multiprocessing.Queue()
+          self.proc = multiprocessing.Process(target=_serve, daemon=True,
+                                              args=(kwargs, ready, self.requests, self.connections))
+          self.proc.start()
+          self.port = ready.get(timeout=60)
+
+      def counters(self):
+          time.sleep(0.02)
+          return self.requests.value, self.connections.value
+
+      def close(self):
+          self.proc.terminate()
+          self.proc.join()
+
+
+def measure(fn):
+    '''
+    run @fn, return (result, seconds, peak KiB)
+    '''
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        result = fn()
+    except Exception as err:
+        result = err
+    dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return result, dt, peak
+
+
+def reader(port, pool=None):
+    r = finger_reader()
+    r.host = '127.0.0.1'
+    r.port = port
+    r.pool = pool
+    r.by_id = True
+    return r
+
+
+def all_users(fn, users):
+    '''
+    @fn reading users, failing when it does not return the @users of the terminal
+    '''
+    def run():
+        emps = fn()
+        if len(emps) != users:
+           raise ValueError('%s users read, %s on the terminal' % (len(emps), users))
+        return emps
+    return run
+
+
+def bench_reads(term, records, users):
+    '''
+    reads against one terminal, yield (name, result, seconds, peak, reqs, conns)
+    '''
+    def run(name, fn):
+        before = term.counters()
+        result, dt, peak = measure(fn)
+        after = term.counters()
+        return name, result, dt, peak, after[0] - before[0], after[1] - before[1]
+
+    yield run('read_log', lambda: reader(term.port).read_log())
+
+    pool = fk_pool()
+    loop = asyncio.new_event_loop()
+    r = reader(term.port, pool)
+    yield run('async_read_log', lambda: loop.run_until_complete(r.async_read_log()))
+    # steady state poll, nothing new since the cursor
+    yield run('async poll', lambda: loop.run_until_complete(r.async_read_log()))
+
+    yield run('read_user', all_users(lambda: reader(term.port).read_user(), users))
+    # every user list page and every name, as the integration reads a new machine
+    yield run('names (%s)' % users,
+              all_users(lambda: loop.run_until_complete(reader(term.port, pool).async_read_user()), users))
+
+    loop.run_until_complete(pool.close())
+    loop.close()
+
+
+def bench_decode(records, users):
+    '''
+    decoding only, columns against one finger_log per record
+    '''
+    data = fkterm.make_log(records, users)
+
+    def legacy():
+        for i in range(0, len(data), LOG_SIZE):
+            log = finger_log()
+            log.read(data[i:i + LOG_SIZE])
+
+    yield ('decode_logs',) + measure(lambda: decode_logs(memoryview(data))) + (0, 0)
+    yield ('finger_log',) + measure(legacy) + (0, 0)
+
+
+def check_cursor(users, steps=(40, 60, 100, 1000, 3000)):
+    '''
+    resumed reads against a log growing on a terminal capping its pages,
+    return True when every step gives what a full read gives
+    '''
+    async def run():
+        full = fkterm.make_log(steps[-1], users)
+        term = fkterm.terminal(records=0, users=users, max_page=PAGE_SIZE)
+        server = await fkterm.serve(term)
+        port = server.sockets[0].getsockname()[1]
+        pool = fk_pool()
+        ok = True
+        # cursors of this version, then one an older version saved
+        # with a page size the terminal never sent
+        for start in (None, {'page': 0, 'size': 4 * PAGE_SIZE, 'records': steps[0], 'ts': None}):
+            r = reader(port, pool)
+            seen = {}
+            for i, count in enumerate(steps):
+                term.log = full[:count * LOG_SIZE]
+                if start and i == 0:
+                   # time of the last record, as the older version saved it
+                   last = decode_logs(memoryview(term.log[-LOG_SIZE:]))
+                   r.cursor = dict(start, ts=int(last.ts[0]))
+                   seen = await reader(port, pool).async_read_log()
+                   continue
+                seen.update(await r.async_read_log())
+                want = await reader(port, pool).async_read_log()
+                good = seen == want and r.cursor['records'] == count
+                ok = ok and good
+                print('%-8s %5s records  cursor %-44s %s'
+                      % ('older' if start else 'current', count,
+                         {k: r.cursor[k] for k in ('size', 'records')}, 'ok' if good else 'FAILED'))
+        await pool.close()
+        server.close()
+        return ok
+
+    return asyncio.run(run())
+
+
+def report(records, scenario, rows):
+    for name, result, dt, peak, reqs, conns in rows:
+        if isinstance(result, Exception):
+           print('%7s %-8s %-16s failed: %s: %s'
+                 % (records, scenario, name, type(result).__name__, result))
+           continue
+        rate = records / dt if dt and not name.startswith(('names', 'read_user', 'async poll')) else 0
+        print('%7s %-8s %-16s %9.3f s %12s %6s %6s %10.0f'
+              % (records, scenario, name, dt, '%.0f' % rate if rate else '-', reqs, conns, peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, nargs='*', default=[1000, 10000, 100000])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--scenario', nargs='*', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--max-page', type=int, default=None)
+    parser.add_argument('--check', action='store_true', help='check resumed reads, no benchmark')
+    args = parser.parse_args()
+
+    if args.check:
+       sys.exit(0 if check_cursor(args.users) else 1)
+
+    print('%7s %-8s %-16s %11s %12s %6s %6s %10s'
+          % ('records', 'terminal', 'read', 'time', 'records/s', 'reqs', 'conns', 'peak KiB'))
+    for records in args.records:
+        report(records, '-', bench_decode(records, args.users))
+        for scenario in args.scenario:
+            term = remote_terminal(records=records, users=args.users, max_page=args.max_page,
+                                   **SCENARIOS[scenario])
+            try:
+                report(records, scenario, bench_reads(term, records, args.users))
+            finally:
+                term.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Fleet load harness for the cloud devices of the integration.
+
+For each fleet size, serves that many synthetic devices from the cloud
+stand-in (fwcloud.py), boots Home Assistant in a fresh config directory
+with one hass_fwiot entry holding all keys and base_url pointing at the
+stand-in, and reports:
+
+  setup s     time until the entry is loaded, as seen inside hass
+  entities    hass_fwiot entities, counted once their number stops growing
+  boot s      time from starting hass until the entry is loaded
+  lag ms      event loop lag in steady state, p50 / p99 / max
+  rps         requests per second the stand-in served in steady state
+  cpu %       cpu time of the hass process over the steady state window
+  rss MiB     resident memory of hass at the end, and its peak
+
+A small probe integration is written in the config directory; it
+measures the loop lag inside hass and writes it to fwiot_probe.json.
+Needs Home Assistant and aiohttp installed, and Linux for /proc.
+
+  python bench/bench_fleet.py --devices 10 100 1000 --duration 120
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+COMPONENT = os.path.abspath(os.path.join(HERE, '..', 'custom_components', 'hass-fwiot'))
+
+import fwcloud
+
+SETTLE = 3.0
+''' seconds without new entities after which setup is done '''
+
+PROBE = '''
+import asyncio
+import json
+import time
+
+TICK = 0.05
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+async def async_setup(hass, config):
+    start = time.monotonic()
+    stats = {'setup': None, 'lag': {}}
+    lags = []
+
+    def loaded():
+        entries = hass.config_entries.async_entries('hass_fwiot')
+        return entries and all(getattr(e.state, 'value', e.state) == 'loaded' for e in entries)
+
+    def entities():
+        # platforms are still adding entities when the entry is loaded
+        from homeassistant.helpers import entity_registry as er
+        ids = [e.entity_id for e in er.async_get(hass).entities.values() if e.platform == 'hass_fwiot']
+        return sum(1 for each in ids if hass.states.get(each) is not None)
+
+    async def watch():
+        last_write = changed = time.monotonic()
+        while True:
+            t = time.monotonic()
+            await asyncio.sleep(TICK)
+            now = time.monotonic()
+            if stats['setup'] is None:
+                if loaded():
+                    stats['setup'] = now - start
+            else:
+                lags.append(now - t - TICK)
+            if now - last_write >= 1:
+                last_write = now
+                if stats['setup'] is not None:
+                    count = entities()
+                    if count != stats.get('entities'):
+                        stats['entities'] = count
+                        changed = now
+                    stats['entities_age'] = now - changed
+                stats['lag'] = {'p50': percentile(lags, 0.5), 'p99': percentile(lags, 0.99),
+                                'max': max(lags, default=0), 'samples': len(lags)}
+                with open(hass.config.path('fwiot_probe.json'), 'w') as f:
+                    json.dump(stats, f)
+
+    hass.loop.create_task(watch())
+    return True
+'''
+
+
+def write_config(path, keys, base_url):
+    '''
+    config directory with the integration, the probe and one config entry
+    '''
+    os.makedirs(os.path.join(path, 'custom_components', 'fwiot_probe'))
+    os.makedirs(os.path.join(path, '.storage'))
+    os.symlink(COMPONENT, os.path.join(path, 'custom_components', 'hass_fwiot'))
+    with open(os.path.join(path, 'custom_components', 'fwiot_probe', '__init__.py'), 'w') as f:
+        f.write(PROBE)
+    with open(os.path.join(path, 'custom_components', 'fwiot_probe', 'manifest.json'), 'w') as f:
+        json.dump({'domain': 'fwiot_probe', 'name': 'fwiot probe', 'version': '0.0.1',
+                   'dependencies': [], 'codeowners': [], 'iot_class': 'local_push'}, f)
+    with open(os.path.join(path, 'configuration.yaml'), 'w') as f:
+        f.write('homeassistant:\n  name: fleet\n  time_zone: UTC\n'
+                'logger:\n  default: warning\nfwiot_probe:\n')
+    with open(os.path.join(path, '.storage', 'core.config_entries'), 'w') as f:
+        json.dump({'version': 1, 'key': 'core.config_entries', 'data': {'entries': [{
+            'entry_id': 'fleet', 'version': 1, 'domain': 'hass_fwiot', 'title': 'Devices',
+            'data': {'keys': keys, 'base_url': base_url}, 'options': {},
+            'pref_disable_new_entities': False, 'pref_disable_polling': False,
+            'source': 'user', 'unique_id': None, 'disabled_by': None}]}}, f)
+
+
+def proc_stats(pid):
+    '''
+    (cpu seconds, rss MiB, peak rss MiB) of process @pid
+    '''
+    with open('/proc/%s/stat' % pid) as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    mem = {}
+    with open('/proc/%s/status' % pid) as f:
+        for line in f:
+            if line.startswith(('VmRSS', 'VmHWM')):
+                name, value = line.split(':')
+                mem[name] = int(value.split()[0]) / 1024
+    return cpu, mem.get('VmRSS', 0), mem.get('VmHWM', 0)
+
+
+def read_probe(path):
+    try:
+        with open(os.path.join(path, 'fwiot_probe.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+async def run_fleet(devices, duration, every, interval, timeout):
+    cl = fwcloud.cloud(devices, interval)
+    runner, port = await fwcloud.serve(cl)
+    keys = {fwcloud.device_key(i): {'type': 'iot', 'token': 'sim-%s' % i, 'every': every}
+            for i in range(devices)}
+    try:
+        with tempfile.TemporaryDirectory() as path:
+            write_config(path, keys, 'http://127.0.0.1:%s' % port)
+            log = open(os.path.join(path, 'hass.log'), 'w')
+            t0 = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, '-m', 'homeassistant', '-c', path, '--skip-pip',
+                stdout=subprocess.DEVNULL, stderr=log)
+            try:
+                probe = {}
+                while probe.get('setup') is None:
+                    if proc.returncode is not None or time.monotonic() - t0 > timeout:
+                        raise RuntimeError('hass did not load the entry, see log:\n%s'
+                                           % open(log.name).read()[-2000:])
+                    await asyncio.sleep(0.2)
+                    probe = read_probe(path)
+                boot = time.monotonic() - t0
+
+                # wait for the platforms: entity count unchanged for SETTLE seconds
+                while not probe.get('entities') or probe.get('entities_age', 0) < SETTLE:
+                    if proc.returncode is not None or time.monotonic() - t0 > timeout:
+                        raise RuntimeError('hass did not add the entities, see log:\n%s'
+                                           % open(log.name).read()[-2000:])
+                    await asyncio.sleep(0.2)
+                    probe = read_probe(path)
+
+                req0 = cl.requests
+                cpu0 = proc_stats(proc.pid)[0]
+                t1 = time.monotonic()
+                await asyncio.sleep(duration)
+                dt = time.monotonic() - t1
+                cpu1, rss, peak = proc_stats(proc.pid)
+                rps = (cl.requests - req0) / dt
+                probe = read_probe(path)
+            finally:
+                if proc.returncode is None:
+                    proc.terminate()
+                    await proc.wait()
+                log.close()
+    finally:
+        await runner.cleanup()
+
+    lag = probe.get('lag', {})
+    return {'devices': devices, 'setup': probe['setup'], 'boot': boot,
+            'entities': probe.get('entities', 0),
+            'lag': (lag.get('p50', 0) * 1000, lag.get('p99', 0) * 1000, lag.get('max', 0) * 1000),
+            'rps': rps, 'cpu': (cpu1 - cpu0) / dt * 100, 'rss': rss, 'peak': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='*', default=[10, 100, 1000])
+    parser.add_argument('--duration', type=float, default=60.0,
+                        help='seconds of steady state measured after setup')
+    parser.add_argument('--every', type=int, default=1, help='device update period, minutes')
+    parser.add_argument('--interval', type=float, default=10.0,
+                        help='seconds between two records of a simulated device')
+    parser.add_argument('--timeout', type=float, default=600.0, help='seconds allowed for setup')
+    args = parser.parse_args()
+
+    print('%7s %8s %8s %8s %24s %8s %7s %15s'
+          % ('devices', 'setup s', 'boot s', 'entities', 'lag ms p50/p99/max', 'rps', 'cpu %', 'rss/peak MiB'))
+    for devices in args.devices:
+        r = asyncio.run(run_fleet(devices, args.duration, args.every, args.interval, args.timeout))
+        print('%7s %8.2f %8.2f %8s %24s %8.1f %7.1f %15s'
+              % (r['devices'], r['setup'], r['boot'], r['entities'], '%.1f / %.1f / %.1f' % r['lag'],
+                 r['rps'], r['cpu'], '%.0f / %.0f' % (r['rss'], r['peak'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Fingerprint terminal simulator.
+
+A local asyncio TCP server speaking the 55 aa framing read by
+custom_components/hass-fwiot/finger:
+
+  0xa4 / 0xa1  log page     55 aa 00 <cmd> 00 00 00 00 62 08 <page:2> <size:2> 05 00
+  0x97         user list    55 aa 00 97 b8 00 00 00 03 00 <page> 00 b8 00 06 00
+  0xc7         user name    55 aa 00 c7 <user:4> 00 00 00 00 0e 00 05 00
+
+Every reply is the 12 byte header aa 55 01 01 00 00 00 00 06 00 55 aa
+followed by the data asked for.  Log pages past the end of the log are
+header only, like the real machine.  0xa1 is served like 0xa4.
+
+Faults can be injected per terminal: a delay before each reply, replies
+written in small chunks (short reads on the client) and connections
+closed after every few replies.
+
+Run standalone:
+
+  python bench/fkterm.py --records 10000 --users 300 --port 5005
+"""
+import argparse
+import asyncio
+import random
+import struct
+
+HEAD = bytes([0xaa,0x55,0x01,0x01,0x00,0x00,0x00,0x00,0x06,0x00,0x55,0xaa])
+REQUEST_SIZE = 16
+USER_SLOTS = 23
+''' user list reply holds 184 bytes, 8 per user '''
+NAME_SIZE = 14
+
+
+def record(uid, year, month, day, hour, minute, second):
+    '''
+    one 12 byte log record
+
+    @uid user number
+    '''
+    t = ((year - 1964) << 26) | (month << 20) | ((hour & 7) << 13) \
+        | (day << 8) | (minute << 2) | (hour >> 3)
+    return struct.pack('<I3xB', uid, second) + t.to_bytes(4, byteorder='big')
+
+
+def make_log(count, users, seed=1):
+    '''
+    synthetic log of @count records for users 1..@users, in time order
+    '''
+    rnd = random.Random(seed)
+    out = bytearray()
+    minute = 0
+    for i in range(count):
+        minute += rnd.randint(0, 3)
+        day, rest = divmod(minute, 24 * 60)
+        month, day = divmod(day, 28)
+        out += record(rnd.randint(1, users), 2022 + month // 12, month % 12 + 1,
+                      day + 1, rest // 60, rest % 60, rnd.randint(0, 59))
+    return bytes(out)
+
+
+class terminal():
+      '''
+      state and faults of one simulated machine
+      '''
+      def __init__(self, records=1000, users=20, seed=1, max_page=None,
+                   latency=0.0, chunk=0, drop_every=0):
+          self.log = make_log(records, users, seed)
+          ''' log stream, 12 bytes per record '''
+          self.users = users
+          ''' users are numbered 1..users '''
+          self.max_page = max_page
+          ''' largest log page sent, None = any size asked '''
+          self.latency = latency
+          ''' seconds before each reply '''
+          self.chunk = chunk
+          ''' reply written in pieces of this size, 0 = at once '''
+          self.drop_every = drop_every
+          ''' close connection after this many replies, 0 = keep open '''
+          self.requests = 0
+          ''' requests served '''
+          self.connections = 0
+          ''' connections accepted '''
+
+      def name(self, uid):
+          return 'U%d' % uid
+
+      def reply(self, req):
+          '''
+          reply to one request, None for unknown commands
+          '''
+          cmd = req[3]
+          if cmd in (0xa4, 0xa1):
+             page = int.from_bytes(req[10:12], byteorder='little')
+             size = int.from_bytes(req[12:14], byteorder='little')
+             if self.max_page: size = min(size, self.max_page)
+             return HEAD + self.log[page * size:(page + 1) * size]
+          if cmd == 0x97:
+             first = int.from_bytes(req[10:12], byteorder='little') * USER_SLOTS + 1
+             ids = range(first, min(first + USER_SLOTS, self.users + 1))
+             body = b''.join(struct.pack('<I4x', uid) for uid in ids)
+             return HEAD + body.ljust(USER_SLOTS * 8, b'\0')
+          if cmd == 0xc7:
+             uid = int.from_bytes(req[4:8], byteorder='little')
+             name = self.name(uid).encode('utf-16-le') if 0 < uid <= self.users else b''
+             return HEAD + name[:NAME_SIZE].ljust(NAME_SIZE, b'\0')
+          return None
+
+      async def handle(self, reader, writer):
+          self.connections += 1
+          served = 0
+          try:
+              while True:
+                  try:
+                      req = await reader.readexactly(REQUEST_SIZE)
+                  except (asyncio.IncompleteReadError, ConnectionError):
+                      break
+                  self.requests += 1
+                  data = self.reply(req)
+                  if data is None: break
+                  if self.latency: await asyncio.sleep(self.latency)
+                  if self.chunk:
+                     for i in range(0, len(data), self.chunk):
+                         writer.write(data[i:i + self.chunk])
+                         await writer.drain()
+                         await asyncio.sleep(0.001)
+                  else:
+                     writer.write(data)
+                     await writer.drain()
+                  served += 1
+                  if self.drop_every and served % self.drop_every == 0: break
+          except ConnectionError:
+              pass
+          finally:
+              writer.close()
+
+
+async def serve(term, host='127.0.0.1', port=0):
+    '''
+    start serving @term, return the asyncio server (port 0 = any free port)
+    '''
+    return await asyncio.start_server(term.handle, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--max-page', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--chunk', type=int, default=0)
+    parser.add_argument('--drop-every', type=int, default=0)
+    args = parser.parse_args()
+
+    term = terminal(args.records, args.users, max_page=args.max_page, latency=args.latency,
+                    chunk=args.chunk, drop_every=args.drop_every)
+
+    async def run():
+        server = await serve(term, args.host, args.port)
+        print('terminal with %s records, %s users on %s:%s'
+              % (args.records, args.users, args.host, args.port))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print('%s requests, %s connections' % (term.requests, term.connections))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""FWIOT cloud stand-in.
+
+A local aiohttp server answering the two calls the integration makes to
+iot.frontware.com, for any number of synthetic devices:
+
+  /status/<key>                      device status
+  /json/<key>.json?lastid=&limit=    records with id above lastid, oldest first
+
+Keys are 36 characters, like real API keys: 00000000-0000-4000-8000-000000000000
+for device 0 and so on.  Even devices are THERMIDITY, odd ones EMPDETECTOR.
+Each device starts with --history records (1000) and gets a new one every
+--interval seconds; one record in five is a status record, the others carry data.
+
+Point the integration at it with base_url in the config entry data:
+
+  python bench/fwcloud.py --devices 1000 --port 8123
+"""
+import argparse
+import json
+import time
+
+from aiohttp import web
+
+START_RECORDS = 1000
+STATUS_EVERY = 5
+DEVICE_TYPES = (('THERMIDITY', 'Thermidity'), ('EMPDETECTOR', 'Employee detector'))
+
+
+def device_key(num):
+    return '%08d-0000-4000-8000-000000000000' % num
+
+
+class cloud():
+      '''
+      synthetic devices and request counters
+      '''
+      def __init__(self, devices=100, interval=10.0, history=START_RECORDS):
+          self.devices = devices
+          ''' number of devices '''
+          self.interval = interval
+          ''' seconds between two records of a device '''
+          self.history = history
+          ''' records of a device before the start '''
+          self.start = time.time()
+          self.requests = 0
+          ''' requests served '''
+          self.records_served = 0
+          ''' records served '''
+
+      def device(self, key):
+          '''
+          device number of @key, None when unknown
+          '''
+          try:
+              num = int(key[:8])
+          except ValueError:
+              return None
+          if key != device_key(num) or num >= self.devices:
+             return None
+          return num
+
+      def last_id(self, num):
+          '''
+          id of the newest record of device @num
+          '''
+          # devices do not all tick at the same time
+          age = time.time() - self.start + (num % 97) * self.interval / 97
+          return self.history + int(age / self.interval)
+
+      def record(self, num, rid):
+          ts = int(self.start + (rid - self.history) * self.interval)
+          if rid % STATUS_EVERY == 0:
+             data = {'status': 'Online', 'ts': ts}
+          elif num % 2 == 0:
+             data = {'temp': 20 + (rid * 7 + num) % 150 / 10, 'hum': 40 + (rid * 3 + num) % 40, 'ts': ts}
+          else:
+             data = {'detected': rid % 3 == 0, 'employee': 'E%03d' % (rid % 50), 'ts': ts}
+          return {'id': rid, 'data': json.dumps(data)}
+
+      async def status(self, request):
+          self.requests += 1
+          num = self.device(request.match_info['key'])
+          if num is None:
+             raise web.HTTPNotFound()
+          code, name = DEVICE_TYPES[num % 2]
+          return web.json_response({
+              'serial': 'SIM%06d' % num,
+              'token': 'sim-%s' % num,
+              'device_type_code': code,
+              'device_type_name': name,
+              'manu': 'Frontware IOT',
+              'version': '1.0',
+              'active': True,
+              'locked': False,
+              'status': 'Online',
+              'last_online': int(time.time()),
+          })
+
+      async def records(self, request):
+          self.requests += 1
+          num = self.device(request.match_info['key'])
+          if num is None:
+             raise web.HTTPNotFound()
+          try:
+              lastid = int(request.query.get('lastid', 0))
+              limit = int(request.query.get('limit', 20))
+          except ValueError:
+              raise web.HTTPBadRequest()
+          last = self.last_id(num)
+          ids = range(max(lastid, 0) + 1, min(last, lastid + limit) + 1)
+          self.records_served += len(ids)
+          return web.json_response([self.record(num, rid) for rid in ids])
+
+      def app(self):
+          app = web.Application()
+          app.router.add_get('/status/{key}', self.status)
+          app.router.add_get('/json/{key}.json', self.records)
+          return app
+
+
+async def serve(cl, host='127.0.0.1', port=0):
+    '''
+    start serving @cl, return (runner, port), port 0 = any free port
+    '''
+    runner = web.AppRunner(cl.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=10.0)
+    parser.add_argument('--history', type=int, default=START_RECORDS)
+    args = parser.parse_args()
+
+    cl = cloud(args.devices, args.interval, args.history)
+    print('%s devices on http://%s:%s' % (args.devices, args.host, args.port))
+    web.run_app(cl.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,27 @@
 """The Detailed Hello World Push integration."""
 from __future__ import annotations
 
+import asyncio
+
 from homeassistant.core import HomeAssistant, callback, ServiceCall, Event
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST, CONF_TOKEN, Platform, EVENT_HOMEASSISTANT_STOP
+from homeassistant.const import CONF_HOST, CONF_TOKEN, Platform, EVENT_HOMEASSISTANT_STOP, EVENT_HOMEASSISTANT_STARTED
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.helpers.dispatcher import dispatcher_send
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.exceptions import ConfigEntryNotReady
 
 from . import fwiot
 from .const import DOMAIN, KEY_COORDINATOR, KEY_DEVICE,\
                    LOGGER, POLLING_TIMEOUT_SEC, UPDATE_INTERVAL,\
+                   SETUP_CONCURRENCY, ROSTER_INTERVAL, DEVICE_FINGER,\
+                   CONF_BASE_URL, DEFAULT_BASE_URL,\
                    ATTR_SETTING, ATTR_VALUE, ATTR_ENTITY_ID,\
                    SERVICE_SETTINGS, CHANGE_SETTING_SCHEMA,\
                    SERVICE_CAPTURE_IMAGE, CAPTURE_IMAGE_SCHEMA,\
-                   SERVICE_TRIGGER_AUTOMATION, AUTOMATION_SCHEMA 
+                   SERVICE_TRIGGER_AUTOMATION, AUTOMATION_SCHEMA,\
+                   SERVICE_PROFILE, PROFILE_SCHEMA, ATTR_SECONDS
 
 # List of platforms to support. There should be a matching .py file for each,
 # eg <cover.py> and <sensor.py>
@@ -24,37 +31,91 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up FWIOT from a config entry."""
     # Store an instance of the "connecting" class that does the work of speaking
     # with your actual devices.
-    print('xxxxxxxxxxxxxxxxxxxxx')
-    print(entry.data.get('keys'))
-    print('xxxxxxxxxxxxxxxxxxxxx')
+    LOGGER.debug('Setup entry with keys %s', list(entry.data.get('keys')))
     fwsys = fwiot.FWIOTSystem(hass)
     fwsys.async_add_sensors = async_add_sensors
+    fwsys.base_url = entry.data.get(CONF_BASE_URL, DEFAULT_BASE_URL).rstrip('/')
 
     if not DOMAIN in hass.data:
        hass.data[DOMAIN] = fwsys
-
-    for each in entry.data.get('keys'):        
-        tt = entry.data.get('keys').get(each,{}).get('type','')
-        if not each in fwsys.devices:
-           if tt == 'iot': 
-              await hass.async_add_executor_job(fwsys.get_device, each)
-           else:
-              pp = entry.data.get('keys')[each]['port']
-              tz = entry.data.get('keys')[each].get('tz','')
-              uu = entry.data.get('keys')[each].get('update',5)
-              await hass.async_add_executor_job(fwsys.check_finger, each, pp, tz, uu)  
-
+    else:
+       fwsys.cache = hass.data[DOMAIN].cache
+
+    limit = asyncio.Semaphore(SETUP_CONCURRENCY)
+    keys = [each for each in entry.data.get('keys') if not each in fwsys.devices]
+
+    async def setup_device(key):
+        async with limit:
+           return await fwsys.async_setup_device(key, entry.data.get('keys')[key])
+
+    results = await asyncio.gather(*[setup_device(each) for each in keys], return_exceptions=True)
+    stale = []
+    for key, res in zip(keys, results):
+        if isinstance(res, Exception):
+           LOGGER.error('Setup of device %s failed: %s', key, res)
+        elif res:
+           stale.append(key)
+    if keys and not fwsys.devices:
+       raise ConfigEntryNotReady('No device could be set up')
+
+    coordinators = []
     for each in fwsys.devices:
-        fwsys.devices[each].coordinator = fwiot.FWIOTDataUpdateCoordinator(hass, fwsys.devices[each])
-        await fwsys.devices[each].coordinator.async_config_entry_first_refresh()
+        coordinator = fwsys.devices[each].coordinator = fwsys.get_coordinator(fwsys.devices[each])
+        if not coordinator in coordinators:
+           coordinators.append(coordinator)
 
     platforms = get_platforms(entry)
 
     #await async_create_device_and_coordinator(hass, entry)
     entry.async_on_unload(entry.add_update_listener(update_listener))
 
+    # entities are added at once with their state before restart,
+    # devices are read in background once hass is started
     hass.config_entries.async_setup_platforms(entry, platforms)
 
+    async def first_refresh(coordinator):
+        async with limit:
+           await coordinator.async_refresh()
+
+    async def refresh_device(key):
+        async with limit:
+           await fwsys.async_refresh_device(key)
+
+    async def refresh_all() -> None:
+        ''' first update of every device, then status of devices set up from cache '''
+        await asyncio.gather(*[first_refresh(each) for each in coordinators])
+        await asyncio.gather(*[refresh_device(each) for each in stale])
+
+    task = None
+    unloaded = False
+
+    @callback
+    def start_refresh(event=None) -> None:
+        nonlocal task
+        if not unloaded:
+           task = hass.async_create_task(refresh_all())
+
+    @callback
+    def stop_refresh() -> None:
+        nonlocal unloaded
+        unloaded = True
+        if task is not None:
+           task.cancel()
+
+    entry.async_on_unload(stop_refresh)
+    if hass.is_running:
+       start_refresh()
+    else:
+       hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, start_refresh)
+
+    async def refresh_rosters(now=None) -> None:
+        ''' read new employees of fingerprint machines '''
+        for each in list(fwsys.devices):
+            if fwsys.devices[each].type == DEVICE_FINGER:
+               await fwsys.async_refresh_device(fwsys.devices[each]._key)
+
+    entry.async_on_unload(async_track_time_interval(hass, refresh_rosters, ROSTER_INTERVAL))
+
     await setup_hass_events(hass)
     await hass.async_add_executor_job(setup_hass_services, hass)
 
@@ -63,8 +124,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def setup_hass_events(hass: HomeAssistant) -> None:
     """Home Assistant start and stop callbacks."""
 
-    def logout(event: Event) -> None:
-         print('hass logout')
+    async def logout(event: Event) -> None:
+         LOGGER.debug('Home Assistant stop, close connections')
+         await hass.data[DOMAIN].async_close()
 
     hass.data[DOMAIN].logout_listener = hass.bus.async_listen_once(
         EVENT_HOMEASSISTANT_STOP, logout
@@ -75,17 +137,17 @@ def setup_hass_services(hass: HomeAssistant) -> None:
 
     def change_setting(call: ServiceCall) -> None:
         """Change an system setting."""
-        print('change_setting')
+        LOGGER.debug('Service change_setting called: %s', call.data)
         pass
 
     def capture_image(call: ServiceCall) -> None:
         """Capture a new image."""
-        print('capture_image')
+        LOGGER.debug('Service capture_image called: %s', call.data)
         pass
 
     def trigger_automation(call: ServiceCall) -> None:
         """Trigger an automation."""
-        print('trigger_automation')
+        LOGGER.debug('Service trigger_automation called: %s', call.data)
         pass
 
     hass.services.register(
@@ -100,12 +162,21 @@ def setup_hass_services(hass: HomeAssistant) -> None:
     #     DOMAIN, SERVICE_TRIGGER_AUTOMATION, trigger_automation, schema=AUTOMATION_SCHEMA
     # )
 
+    async def profile(call: ServiceCall) -> None:
+        """Profile the integration and write a report in config directory."""
+        await hass.data[DOMAIN].async_profile(call.data[ATTR_SECONDS])
+
+    hass.services.register(
+        DOMAIN, SERVICE_PROFILE, profile, schema=PROFILE_SCHEMA
+    )
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     # This is called when an entry/configured device is to be removed. The class
     # needs to unload itself, and remove callbacks. See the classes for further
     # details
     hass.services.async_remove(DOMAIN, SERVICE_SETTINGS)
+    hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
     # hass.services.async_remove(DOMAIN, SERVICE_CAPTURE_IMAGE)
     # hass.services.async_remove(DOMAIN, SERVICE_TRIGGER_AUTOMATION)
 
@@ -114,6 +185,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     if DOMAIN in hass.data and hass.data[DOMAIN]:
        hass.data[DOMAIN].logout_listener()
+       await hass.data[DOMAIN].async_close()
        hass.data.pop(DOMAIN)
 
     return unload_ok
@@ -125,7 +197,7 @@ def get_platforms(config_entry):
 
 async def update_listener(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
     """Handle options update."""
-    print('xxxxxxxxxxx update_listener')
+    LOGGER.debug('Options updated, reload entry %s', config_entry.entry_id)
     await hass.config_entries.async_reload(config_entry.entry_id)
 
 def async_add_sensors(hass: HomeAssistant, async_add_entities: AddEntitiesCallback, validate_sensor_fn: any):
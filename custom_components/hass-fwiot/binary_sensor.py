@@ -4,7 +4,8 @@ from __future__ import annotations
 from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import STATE_ON
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
@@ -45,9 +46,6 @@ class FWIOTDeviceActive(FWIOTEntity, BinarySensorEntity):
     def is_on(self) -> bool:
         return self._device.active
 
-    async def async_update(self):
-        print('async_update')
-
 class FWIOTDeviceLock(FWIOTEntity, BinarySensorEntity):
     """A device lock implementation for device."""
     def __init__(self, device: FWIOTDevice) -> None:
@@ -59,9 +57,6 @@ class FWIOTDeviceLock(FWIOTEntity, BinarySensorEntity):
     def is_on(self) -> bool:
         return self._device.locked
 
-    async def async_update(self):
-        print('async_update')                
-
     @property
     def icon(self):
         return 'mdi:lock' if self._device.locked else 'mdi:lock-open'
@@ -80,8 +75,14 @@ class FWIOTEmployeeFound(FWIOTEntity, BinarySensorEntity):
         """Return True if the binary sensor is on."""
         return self._found  
 
-    async def async_update(self):
-        self._found = self.coordinator.data.get('data', {}).get('detected', False)
+    @callback
+    def _restore_state(self, state) -> None:
+        self._found = state.state == STATE_ON
+
+    @callback
+    def _update_from_data(self) -> None:
+        if self._device.data.get('data', False):
+           self._found = self._device.data.get('data', {}).get('detected', False)
     
     @property
     def icon(self):
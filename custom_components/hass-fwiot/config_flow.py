@@ -17,7 +17,7 @@ from .const import DOMAIN,\
                    FIELD_MODE, FIELD_QUERY,\
                    FLOWTYPE_FINGER, FLOWTYPE_IOT,\
                    MODETYPE_ADD, MODETYPE_CHANGE
-from .fwiot import FWIOTSystem, FWIOTDataUpdateCoordinator
+from .fwiot import FWIOTSystem
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,12 +54,10 @@ async def validate_api(hass: HomeAssistant, data: dict) -> dict[str, Any]:
     ss = None
     tk = None
     try:
-        s = await hass.async_add_executor_job(
-            fwsys.get_device, data[FIELD_API]
-        )
+        s = await fwsys.async_get_device(data[FIELD_API])
         ss = s.get('serial')        
         tk = s.get('token')
-        fwsys.devices[ss].coordinator = FWIOTDataUpdateCoordinator(hass, fwsys.devices[ss])
+        fwsys.devices[ss].coordinator = fwsys.get_coordinator(fwsys.devices[ss])
         await fwsys.devices[ss].coordinator.async_config_entry_first_refresh()
 
     except Exception as e:
@@ -98,14 +96,14 @@ async def validate_finger_ip(hass: HomeAssistant, data: dict) -> dict[str, Any]:
     
     fwsys:FWIOTSystem = hass.data[DOMAIN]   
     try:
-        ss = await hass.async_add_executor_job(
-            fwsys.check_finger, data[FIELD_IP], data[FIELD_PORT], data[FIELD_TZ], data[FIELD_UPDATE_EVERY]
+        ss = await fwsys.async_check_finger(
+            data[FIELD_IP], data[FIELD_PORT], data[FIELD_TZ], data[FIELD_UPDATE_EVERY]
         )
-        fwsys.devices[ss].coordinator = FWIOTDataUpdateCoordinator(hass, fwsys.devices[ss])
+        fwsys.devices[ss].coordinator = fwsys.get_coordinator(fwsys.devices[ss])
         await fwsys.devices[ss].coordinator.async_config_entry_first_refresh()
 
     except Exception as e:
-        print(e)
+        _LOGGER.debug('Add fingerprint failed: %s', e)
         if e.args[0] == 2:
            raise ErrorDeviceAlreadyExist
         else:
@@ -165,7 +163,7 @@ async def form_device_add_iot(cf, user_input=None):
                ks[user_input.get(FIELD_API)] = dt
 
                cf.hass.config_entries.async_update_entry(
-                    cf.config_entry, data={"keys":ks}
+                    cf.config_entry, data={**cf.config_entry.data, "keys":ks}
                )
                cf.hass.async_create_task(
                   cf.hass.config_entries.async_reload(cf.config_entry.entry_id)
@@ -224,7 +222,7 @@ async def form_device_add_finger(cf, user_input=None):
                    ks[user_input.get(FIELD_IP)]=dt
 
                    cf.hass.config_entries.async_update_entry(
-                            cf.config_entry, data={"keys":ks}
+                            cf.config_entry, data={**cf.config_entry.data, "keys":ks}
                    )
                    cf.hass.async_create_task(
                         cf.hass.config_entries.async_reload(cf.config_entry.entry_id)
@@ -327,7 +325,7 @@ async def form_update_finger(cf, user_input=None):
                 ks[ctx['key']]['tz'] = user_input[FIELD_TZ]   
 
                 cf.hass.config_entries.async_update_entry(
-                     cf.config_entry,data={'keys': ks}
+                     cf.config_entry,data={**cf.config_entry.data, "keys": ks}
                 )
                 
                 cf.hass.async_create_task(
@@ -366,7 +364,7 @@ async def form_update_iot(cf, user_input=None):
                 ks[ctx['key']]['every'] = user_input[FIELD_UPDATE_EVERY]
 
                 cf.hass.config_entries.async_update_entry(
-                     cf.config_entry,data={'keys': ks}
+                     cf.config_entry,data={**cf.config_entry.data, "keys": ks}
                 )
                 
                 cf.hass.async_create_task(
@@ -20,11 +20,28 @@ LOGGER = logging.getLogger(__package__)
 DOMAIN = "hass_fwiot"
 ATTRIBUTION = "provided by iot.frontware.com"
 
-DEFAULT_CACHEDB = "fwiot_cache.pickle"
+DEFAULT_BASE_URL = "https://iot.frontware.com"
+CONF_BASE_URL = "base_url"
+
+DEFAULT_CACHEDB = f"{DOMAIN}.cache"
+CACHE_VERSION = 1
+CACHE_SAVE_DELAY = 10
 CONF_POLLING = "polling"
 
 UPDATE_INTERVAL = timedelta(seconds=15)
 POLLING_TIMEOUT_SEC = 10
+SETUP_CONCURRENCY = 8
+HUB_CONCURRENCY = 10
+FETCH_PAGES = 5
+SNAPSHOT_TTL = timedelta(hours=1)
+ROSTER_INTERVAL = timedelta(hours=1)
+ROSTER_RECHECK = 10
+ROSTER_MISSING = 3
+TIMING_WINDOW = 200
+TIMING_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+PROFILE_TOP = 40
+FETCH_LIMIT_MIN = 5
+FETCH_LIMIT_MAX = 200
 
 DEVICE_FINGER = 'FINGER'
 DEVICE_EMPDETECTOR = 'EMPDETECTOR'
@@ -68,10 +85,18 @@ ATTR_USER_NAME = "user_name"
 ATTR_APP_TYPE = "app_type"
 ATTR_EVENT_BY = "event_by"
 ATTR_VALUE = "value"
+ATTR_SECONDS = "seconds"
+ATTR_RECORD_ID = "record_id"
+ATTR_DEVICE = "device"
+ATTR_RECORD = "record"
+
+EVENT_RECORD = f"{DOMAIN}_record"
+''' fired for every data record of a cloud device, oldest first '''
 
 SERVICE_SETTINGS = "change_setting"
 SERVICE_CAPTURE_IMAGE = "capture_image"
 SERVICE_TRIGGER_AUTOMATION = "trigger_automation"
+SERVICE_PROFILE = "profile"
 
 
 CHANGE_SETTING_SCHEMA = vol.Schema(
@@ -80,4 +105,8 @@ CHANGE_SETTING_SCHEMA = vol.Schema(
 
 CAPTURE_IMAGE_SCHEMA = vol.Schema({ATTR_ENTITY_ID: cv.entity_ids})
 
-AUTOMATION_SCHEMA = vol.Schema({ATTR_ENTITY_ID: cv.entity_ids})
\ No newline at end of file
+AUTOMATION_SCHEMA = vol.Schema({ATTR_ENTITY_ID: cv.entity_ids})
+
+PROFILE_SCHEMA = vol.Schema(
+    {vol.Optional(ATTR_SECONDS, default=60): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600))}
+)
@@ -1,47 +1,139 @@
+import sys
+from array import array
+
+class finger_last():
+      '''
+      last log of one user
+      '''
+      __slots__ = ('id', 'ts', 'count')
+
+      def __init__(self, id):
+          self.id = id
+          ''' userid (interned) '''
+          self.ts = 0
+          ''' time of last log (utc epoch) '''
+          self.count = 0
+          ''' number of log '''
+
 class finger_emp():
-      data = {}
-      ''' keypair of userid:[finger_log] '''
-      ids = []
-      ''' list of all user '''
-      idsk = {}
-      ''' keypair of userid:user code '''
+      '''
+      logs of one read session: last log per user, plus the last
+      @history log times per user when asked for
+      '''
+      def __init__(self, history=0, names=None):
+          self.last = {}
+          ''' keypair of user number:finger_last '''
+          self.history = history
+          ''' number of log times kept per user, 0 = last only '''
+          self.times = {}
+          ''' keypair of user number:array of utc epoch, oldest first '''
+          self.idsk = {}
+          ''' keypair of userid:user code '''
+          if names:
+             for each in names:
+                 self.set_name(each, names[each])
+
+      def set_name(self, usid, name):
+          '''
+          set user code of a user
+          @usid userid
+          @name user code
+          '''
+          self.idsk[sys.intern(usid)] = sys.intern(name) if name else name
+
+      def user(self, num):
+          '''
+          last log of user number, created on first use
+          '''
+          rec = self.last.get(num)
+          if rec is None:
+             rec = self.last[num] = finger_last(sys.intern('%02d' % num))
+          return rec
 
       def add(self, log):
           '''
           add log in employee
           @log finger_log object
           '''
-          usid = str(log.id)
-          if not usid in self.data:
-             self.data[usid] = {'logs': []}
-             self.ids.append(usid)
+          rec = self.user(int(log.id))
+          rec.ts = log.ts
+          rec.count += 1
+          if self.history: self.keep(int(log.id), (log.ts,))
+
+      def add_logs(self, logs, first=0):
+          '''
+          add decoded records in employee
+          @logs finger_logs columns
+          @first index of the first record to add
+          '''
+          users = logs.user.tolist()[first:]
+          ts = logs.ts.tolist()[first:]
+          last = self.last
+          for num, t in zip(users, ts):
+              rec = last.get(num)
+              if rec is None: rec = self.user(num)
+              rec.ts = t
+              rec.count += 1
+          if self.history:
+             byuser = {}
+             for num, t in zip(users, ts):
+                 byuser.setdefault(num, []).append(t)
+             for num in byuser:
+                 self.keep(num, byuser[num])
+
+      def keep(self, num, ts):
+          '''
+          add log times in history of a user, oldest are dropped
+          '''
+          times = self.times.get(num)
+          if times is None:
+             times = self.times[num] = array('q')
+          times.extend(ts)
+          if len(times) > self.history:
+             del times[:len(times) - self.history]
+
+      @property
+      def ids(self):
+          '''
+          sorted userid of all user
+          '''
+          return [rec.id for rec in self.sorted()]
+
+      def sorted(self):
+          '''
+          last log of all user, sorted by userid
+          '''
+          return sorted(self.last.values(), key=lambda rec: rec.id)
 
-          log.user = self.idsk.get(usid, usid)  
-          self.data[usid]['logs'].append(log)
-      
       @property
       def count(self):
           '''
           number of user
           '''
-          return len(self.data.keys())
+          return len(self.last)
 
-      def __str__(self):          
+      def name(self, rec):
+          '''
+          user code of a user, userid if unknown
+          '''
+          return self.idsk.get(rec.id, rec.id)
+
+      def __str__(self):
           st = '''--------\nid : count\n--------\n'''
           stc = ''
-          self.ids.sort()
-          for each in self.ids:
-              emplogs = self.data[each]['logs']
-              lastrec = emplogs[-1:][0]
-              st += stc + '%s : %s, last log = %s' % (lastrec.user or '000', len(emplogs), lastrec.time)
+          for rec in self.sorted():
+              st += stc + '%s : %s, last log = %s' % (self.name(rec) or '000', rec.count, rec.ts)
               stc = '\n'
-          return st    
-      
+          return st
+
       def tojson(self):
           ret = {}
-          self.ids.sort()
-          for each in self.ids:
-              emplogs = self.data[each]['logs']
-              lastrec = emplogs[-1:][0]
-              ret[lastrec.user or '000'] = '%s:%s' % (lastrec.time, lastrec.second)
-          return ret  
+          for rec in self.sorted():
+              ret[self.name(rec) or '000'] = rec.ts
+          return ret
+
+      def toids(self):
+          '''
+          keypair of userid:time of last log
+          '''
+          return {rec.id: rec.ts for rec in self.last.values()}
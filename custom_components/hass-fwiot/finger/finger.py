@@ -1,4 +1,7 @@
-from .helper import fk_class
+import asyncio
+
+from .helper import fk_class, fk_aio_class, fk_pool, fk_unreachable, HEAD_SIZE, PAGE_SIZE, NAME_SIZE, username_request
+from .emp import finger_emp
 
 class finger_reader():
     host = '192.168.1.67'
@@ -11,6 +14,34 @@ class finger_reader():
     ''' all/new default = all'''
     verbose = False
     ''' show debug info'''
+    tz = None
+    ''' finger_tz of the machine, default = utc '''
+    names = None
+    ''' keypair of userid:user code, logs are returned by user code, async_read_user reads only names of other users '''
+    recheck = ()
+    ''' userid whose user code async_read_user reads again although it is in names '''
+    by_id = False
+    ''' async_read_log returns logs by userid instead of user code '''
+    history = 0
+    ''' log times kept per user besides the last one '''
+    cursor = None
+    ''' position after the last record read, async_read_log continues from it and updates it '''
+    pool = None
+    ''' fk_pool shared between reads, default = one connection per read '''
+    window = 8
+    ''' log pages requested ahead without waiting, 1 = one page at a time '''
+    page_size = 4 * PAGE_SIZE
+    ''' log page size to ask for, falls back to 1024 if the machine refuses '''
+    timer = None
+    ''' called with (stage, seconds) for connect, send, receive and decode '''
+    complete = True
+    ''' last read_user got every user list page in full, else users may be missing '''
+
+    def new_emps(self):
+        '''
+        employee store for one read
+        '''
+        return finger_emp(history=self.history, names=self.names)
 
     def read_log(self):
         '''
@@ -21,22 +52,18 @@ class finger_reader():
         if self.mode == 'new':
            d6mode = 0xa1 #new
 
-        # command
-        d61 = bytes([0x55,0xaa,0x00,d6mode,0x00,0x00,0x00,0x00,0x62,0x08])
-        # suffix
-        d63 = bytes([0x00,0x00,0x04,0x05,0x00])
-
-        v6 = fk_class(self.host, self.port, timeout=self.timeout, verbose=self.verbose)
+        v6 = fk_class(self.host, self.port, timeout=self.timeout, verbose=self.verbose, tz=self.tz, emps=self.new_emps(), timer=self.timer)
 
         i = 0
-        c = 0
-        v6.read_log(1024, d61, i, d63)
-
-        while c < v6.log_count:
-            c = v6.log_count
-            if self.verbose: print('reading set %s' % (i+1))
-            i += 1
-            v6.read_log(1024, d61, i, d63)
+        try:
+            # until a short page, page number is 2 bytes
+            while i <= 0xffff:
+                if self.verbose: print('reading set %s' % (i+1))
+                n = v6.read_log_page(d6mode, i)
+                i += 1
+                if v6.end or n < PAGE_SIZE: break
+        finally:
+            v6.close()
         
         return v6.emps.tojson()
 
@@ -45,23 +72,86 @@ class finger_reader():
         '''
         read user data from finger print
         '''
-        # command
-        # 97b8
-        d61 = bytes([0x55,0xaa,0x00,0x97,0xb8,0x00,0x00,0x00,0x03,0x00])
-        # suffix
-        d63 = bytes([0x00,0xb8,0x00,0x06,0x00])
+        v6 = fk_class(self.host, self.port, timeout=self.timeout, verbose=self.verbose, tz=self.tz, emps=self.new_emps(), timer=self.timer)
 
-        v6 = fk_class(self.host, self.port, timeout=self.timeout, verbose=self.verbose)
-        i = 0
-        c = 0
-        d = v6.read_user(1024, d61, i, d63)
-        
-        d71 = bytes([0x55,0xaa,0x00,0xc7])
-        # suffix
-        d73 = bytes([0x00,0x00,0x00,0x00,0x0e,0x00,0x05,0x00])
+        try:
+            # pages of users until a short or zero filled one
+            i = 0
+            while v6.read_user_page(i) and i < 0xffff:
+                i += 1
+
+            # user number of 4 bytes, above 255 too
+            for each in list(v6.emps.idsk):
+                num = int(each)
+                v6.parse_username(num, v6.send_request(HEAD_SIZE + NAME_SIZE, username_request(num)))
+        finally:
+            v6.close()
+
+        self.complete = v6.complete
+        return v6.emps.idsk
+
+    async def async_read_log(self):
+        '''
+        read log data from finger print without blocking the event loop
+        '''
+        # a4
+        d6mode = 0xa4 #all
+        if self.mode == 'new':
+           d6mode = 0xa1 #new
+
+        pool = self.pool or fk_pool()
+        v6 = fk_aio_class(self.host, self.port, timeout=self.timeout, verbose=self.verbose, tz=self.tz, emps=self.new_emps(), pool=pool, timer=self.timer)
+
+        conn = v6.connection()
+        try:
+            await conn.probe()
+            await v6.async_read_log_pages(d6mode, window=self.window, size=self.page_size, cursor=self.cursor)
+            if v6.reset:
+               # log was cleared or machine changed, read everything again
+               if self.verbose: print('cursor reset')
+               v6 = fk_aio_class(self.host, self.port, timeout=self.timeout, verbose=self.verbose, tz=self.tz, emps=self.new_emps(), pool=pool, timer=self.timer)
+               await v6.async_read_log_pages(d6mode, window=self.window, size=self.page_size)
+            conn.recovered()
+        except (OSError, asyncio.TimeoutError) as err:
+            if not isinstance(err, fk_unreachable): conn.failed()
+            raise
+        finally:
+            if pool is not self.pool: await pool.close()
+
+        self.cursor = v6.cursor(v6.size)
+
+        return v6.emps.toids() if self.by_id else v6.emps.tojson()
+
+    async def async_read_user(self):
+        '''
+        read user data from finger print without blocking the event loop
+        '''
+        pool = self.pool or fk_pool()
+        v6 = fk_aio_class(self.host, self.port, timeout=self.timeout, verbose=self.verbose, tz=self.tz, emps=finger_emp(), pool=pool, timer=self.timer)
+
+        conn = v6.connection()
+        try:
+            await conn.probe()
+            # pages of users until a short or zero filled one
+            i = 0
+            while await v6.async_read_user_page(i) and i < 0xffff:
+                i += 1
 
-        for each in v6.emps.idsk:
-            bno = int(each).to_bytes(4,byteorder='little')
-            v6.read_username(1024, d71, int(bno[0]), bno[1:] + d73)
+            # names of new users, known users keep their user code
+            known = self.names or {}
+            todo = []
+            for each in list(v6.emps.idsk):
+                if each in known and not each in self.recheck:
+                   v6.emps.set_name(each, known[each])
+                else:
+                   todo.append(int(each))
+            await v6.async_read_usernames(todo, window=self.window)
+            conn.recovered()
+        except (OSError, asyncio.TimeoutError) as err:
+            if not isinstance(err, fk_unreachable): conn.failed()
+            raise
+        finally:
+            if pool is not self.pool: await pool.close()
 
-        return v6.emps.idsk  
\ No newline at end of file
+        self.complete = v6.complete
+        return v6.emps.idsk
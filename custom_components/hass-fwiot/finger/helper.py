@@ -1,9 +1,82 @@
 import socket
+import random
+import asyncio
 import binascii
+from time import perf_counter
+from collections import deque
 
-from .log import finger_log
+from .log import decode_logs, LOG_SIZE
 from .emp import finger_emp
 
+HEAD_SIZE = 12
+''' response header size: aa 55 01 01 00 00 00 00 06 00 55 aa '''
+HEAD_START = bytes([0xaa,0x55,0x01,0x01])
+HEAD_END = bytes([0x55,0xaa])
+PAGE_SIZE = 1024
+''' log page size every machine accepts '''
+FRAME_IDLE = 1.0
+''' seconds without data that ends a response shorter than expected, well
+above the TCP retransmission timeout (200 ms) so a lost segment does not cut
+a response short '''
+USER_SIZE = 184
+''' user list page size after the header, 8 bytes per user '''
+USER_SLOT = 8
+''' size of one user in the user list '''
+KEEPALIVE_PROBE = 2
+''' stream closed sooner than this after a response = no keep-alive '''
+NAME_SIZE = 14
+''' user name response size after the header '''
+BACKOFF_MIN = 30
+''' seconds a machine is not tried after a failed session, doubled on each failure in a row '''
+BACKOFF_MAX = 30 * 60
+''' longest time a failing machine is not tried '''
+
+def log_request(mode, num, size=PAGE_SIZE):
+    '''
+    build log request
+
+    55 aa 00 <mode> 00 00 00 00 62 08 <page:2> <size:2> 05 00
+
+    @mode 0xa4 all / 0xa1 new
+    @num page number start from 0
+    @size page size
+    '''
+    return bytes([0x55,0xaa,0x00,mode,0x00,0x00,0x00,0x00,0x62,0x08]) \
+           + num.to_bytes(2, byteorder='little') \
+           + size.to_bytes(2, byteorder='little') + bytes([0x05,0x00])
+
+def user_request(num):
+    '''
+    build user list request
+
+    55 aa 00 97 b8 00 00 00 03 00 <page:2> <size:2> 06 00
+
+    @num page number start from 0
+    '''
+    return bytes([0x55,0xaa,0x00,0x97,0xb8,0x00,0x00,0x00,0x03,0x00]) \
+           + num.to_bytes(2, byteorder='little') \
+           + USER_SIZE.to_bytes(2, byteorder='little') + bytes([0x06,0x00])
+
+def username_request(num):
+    '''
+    build user name request
+
+    55 aa 00 c7 <user:4> 00 00 00 00 <size:2> 05 00
+
+    @num user number
+    '''
+    return bytes([0x55,0xaa,0x00,0xc7]) + num.to_bytes(4, byteorder='little') \
+           + bytes([0x00,0x00,0x00,0x00]) \
+           + NAME_SIZE.to_bytes(2, byteorder='little') + bytes([0x05,0x00])
+
+def response_size(req):
+    '''
+    full response size for a request: header + size asked in bytes 12-13
+
+    @req request packet
+    '''
+    return HEAD_SIZE + int.from_bytes(req[12:14], byteorder='little')
+
 def test_ping(ip):
     """
     Returns True if host responds to a ping request
@@ -27,15 +100,15 @@ def test_tcp(ip, port):
     return res                        
         
 class fk_class(object):
-      def __init__(self, host, port, timeout=5, verbose=True):
+      def __init__(self, host, port, timeout=5, verbose=True, tz=None, emps=None, timer=None):
           self.timeout = timeout
           '''connection timeout'''
           self.host = host
           ''' finger machine ip/address '''
           self.port = port
           '''finger machine port'''
-          self.left = False
-          ''' temporary: left bytes from previous read  '''
+          self.left = bytearray()
+          ''' start of a record split over two pages (less than 12 bytes) '''
           self.count = 0
           self.log_count = 0
           ''' number of log read '''
@@ -43,38 +116,136 @@ class fk_class(object):
           ''' error message '''
           self.verbose = verbose
           ''' show debug info '''
-          self.emps = finger_emp()
-          ''' employee '''
+          self.emps = emps if emps is not None else finger_emp()
+          ''' employee, logs of this session '''
+          self.tz = tz
+          ''' finger_tz of the machine, default = utc '''
+          self.records = 0
+          ''' index of the next record in the whole log '''
+          self.last_ts = 0
+          ''' time of the last record read (utc epoch) '''
+          self.drop = 0
+          ''' bytes to skip before the next record, already read before '''
+          self.verify = None
+          ''' expected time of the first record, None = no check '''
+          self.end = False
+          ''' empty record reached, or first record did not match verify '''
+          self.reset = False
+          ''' first record did not match verify, log was cleared or changed '''
+          self.size = PAGE_SIZE
+          ''' page size to resume with: the page size used once the machine sent a full page of it, else PAGE_SIZE '''
+          self.sock = None
+          ''' open socket, reused for every request of this session '''
+          self.buf = bytearray(HEAD_SIZE + PAGE_SIZE)
+          ''' receive buffer, reused for every response of this session '''
+          self.timer = timer
+          ''' called with (stage, seconds) for connect, send, receive and decode, None = not timed '''
+          self.complete = True
+          ''' every user list page came in full, else users may be missing '''
 
       def send(self, exp, part1, num, part2):
           """
           send data to fk
 
-          @exp expected size
+          @exp expected response size, header included
           @part1 command part
           @num set number start from 0
           @part2 suffix part (session ?)
           """
           if self.verbose: print()
-          # create connection...
-          s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-          s.settimeout(self.timeout)
-          s.connect_ex((self.host,self.port))
+          return self.send_request(exp, self.request(part1, num, part2))
 
-          # send request              
-          req = part1 + bytearray([num]) + part2
+      def send_request(self, exp, req):
+          """
+          send a built request packet to fk
+
+          @exp expected response size, header included
+          @req request packet
+          """
           if self.verbose: print(binascii.hexlify(req))
-          ss = s.send(req)
-          if self.verbose: print("send size=%s" % ss)
-          if self.verbose: print("expect size=%s" % exp)
 
-          # receive response
-          data0 = s.recv(exp)
-          data = bytearray(data0)
+          reused = self.sock is not None
+          try:
+              data = self._exchange(exp, req)
+          except OSError:
+              self.close()
+              if not reused: raise
+              data = b''
+          if reused and not data:
+             # machine dropped the kept-alive socket, retry on a new one
+             if self.verbose: print('reconnect')
+             self.close()
+             data = self._exchange(exp, req)
+
           if self.verbose: print("receive size=%s" % len(data))
-          
           return data
 
+      def _exchange(self, exp, req):
+          '''
+          send request on the session socket and receive the response
+
+          @exp expected size
+          @req request packet
+          '''
+          if self.sock is None:
+             # create connection...
+             t = perf_counter()
+             s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+             s.settimeout(self.timeout)
+             try:
+                 s.connect((self.host,self.port))
+             except OSError:
+                 s.close()
+                 raise
+             self.sock = s
+             if self.timer: self.timer('connect', perf_counter() - t)
+
+          # send request
+          t = perf_counter()
+          self.sock.sendall(req)
+          if self.timer: self.timer('send', perf_counter() - t)
+          if self.verbose: print("send size=%s" % len(req))
+          if self.verbose: print("expect size=%s" % exp)
+
+          # receive response until it is complete, a response shorter than
+          # expected ends when the machine stops sending for FRAME_IDLE
+          if len(self.buf) < exp: self.buf = bytearray(exp)
+          view = memoryview(self.buf)
+          n = 0
+          t = perf_counter()
+          try:
+              while n < exp:
+                  r = self.sock.recv_into(view[n:exp])
+                  if not r: break
+                  n += r
+                  if n >= HEAD_SIZE: self.sock.settimeout(FRAME_IDLE)
+          except socket.timeout:
+              if n < HEAD_SIZE: raise
+          finally:
+              self.sock.settimeout(self.timeout)
+          if self.timer: self.timer('receive', perf_counter() - t)
+          return view[:n]
+
+      def close(self):
+          '''
+          close the session socket
+          '''
+          if self.sock is not None:
+             try:
+                 self.sock.close()
+             finally:
+                 self.sock = None
+
+      def request(self, part1, num, part2):
+          '''
+          build request packet
+
+          @part1 command part
+          @num set number start from 0
+          @part2 suffix part (session ?)
+          '''
+          return part1 + bytearray([num]) + part2
+
       def read_user(self, exp, part1, num, part2):
           '''
           read all user id
@@ -85,17 +256,41 @@ class fk_class(object):
           @part2 suffix part (session ?)
           '''
           data = self.send(exp, part1, num, part2)
+          self.parse_user(data)
+
+      def read_user_page(self, num):
+          '''
+          read one page of user id, returns True when the page is full
+          and more users may follow
+
+          @num page number start from 0
+          '''
+          data = self.send_request(HEAD_SIZE + USER_SIZE, user_request(num))
+          if len(data) < HEAD_SIZE + USER_SIZE: self.complete = False
+          return self.parse_user(data) == USER_SIZE // USER_SLOT
+
+      def parse_user(self, data):
+          '''
+          parse user id response, returns the number of users found,
+          zero filled slots are not users
+
+          @data response data
+          '''
           # header part  
           # aa 55 01 01 00 00 00 00 06 00 55 aa
           i = 0; l = 12;  
           # h1 = data[i:l]
 
-          i += l; l = 8  
-          while (i+l) < len(data):   
+          i += l; l = USER_SLOT
+          count = 0
+          while (i+l) <= len(data):   
                emp = int.from_bytes(data[i:i+3], byteorder='little')
+               i += l
+               if not emp: continue
 
-               self.emps.idsk['%02d' % emp]=''
-               i += l; l = 8            
+               self.emps.set_name('%02d' % emp, '')
+               count += 1
+          return count
 
       def read_username(self, exp, part1, num, part2):
           '''
@@ -109,6 +304,15 @@ class fk_class(object):
           if num == 0: return
           
           data = self.send(exp, part1, num, part2)
+          self.parse_username(num, data)
+
+      def parse_username(self, num, data):
+          '''
+          parse user name response
+
+          @num user number
+          @data response data
+          '''
           # header part  
           # aa 55 01 01 00 00 00 00 06 00 55 aa
           i = 0; l = 12;  
@@ -117,7 +321,7 @@ class fk_class(object):
 
           i += l; l = 10
           if self.verbose: print(binascii.hexlify(data[i:i+10]))
-          self.emps.idsk['%02d' % num] = data[i:i+10].decode('utf-16').replace('\x00','')
+          self.emps.set_name('%02d' % num, bytes(data[i:i+10]).decode('utf-16').replace('\x00',''))
 
       def read_log(self, exp, part1, num, part2):
           '''
@@ -129,61 +333,654 @@ class fk_class(object):
           @part2 suffix part (session ?)
           '''
           data = self.send(exp, part1, num, part2)
+          self.parse_log(data)
+
+      def read_log_page(self, mode, num, size=PAGE_SIZE):
+          '''
+          read one log page, returns the size received after the header
+
+          @mode 0xa4 all / 0xa1 new
+          @num page number start from 0
+          @size page size
+          '''
+          data = self.send_request(HEAD_SIZE + size, log_request(mode, num, size))
+          self.parse_log(data)
+          return len(data) - HEAD_SIZE
+
+      def parse_log(self, data):
+          '''
+          parse log response, records run on from one page to the next
+
+          @data response data
+          '''
+          if self.end: return
           # header part  
           # aa 55 01 01 00 00 00 00 06 00 55 aa
-          i = 0; l = 12;  
-          h1 = data[i:l]
+          body = memoryview(data)[HEAD_SIZE:]
+          i = 0; l = LOG_SIZE
+
+          # records already read in a previous session
+          if self.drop:
+             i = min(self.drop, len(body))
+             self.drop -= i
+             body = body[i:]
+             i = 0
 
-          # if has left from previous call  
-          if self.left: 
-             data = h1 + self.left + data[i+12:]  
-             if self.verbose: print("head=%s" % binascii.hexlify(h1))
+          # finish the record started on the previous page
+          if self.left:
+             i = l - len(self.left)
+             if len(body) < i:
+                if self.verbose: print('uncomplete data..')
+                self.left += body
+                return
+             rec = self.left + body[:i]
              if self.verbose: print("left=%s" % binascii.hexlify(self.left))
-             if self.verbose: print("new data=%s" % binascii.hexlify(data[:20]))
-             if self.verbose: print("data = h + left + new data")
-             # reset previous left
-             self.left = []
-
-          # next field  
-          i += l; l = 12
-
-          # receive less than record              
-          if len(data) < i+l:
-             if self.verbose: print('uncomplete data..') 
-             self.left = data[i:]
-             if self.verbose: print(binascii.hexlify(h1))
-             if self.verbose: print(binascii.hexlify(data[i:]))
-             return
-
-          log = finger_log()
-          log.read(data[i:i+l])
-          # no left, append log
-          if not log.left:
-             if self.verbose: print(log)
-             self.log_count += 1
-             self.emps.add(log)
-          else:
-             self.left = log.left   
-
-          # still has record data 
-          while (i+l) < len(data):                            
-            #next record 
-            i += l; l = 12  
-            log = finger_log()
-            log.read(data[i:i+l])
-            if log.empty:
-               break
-
-            if not log.left:
-               if self.verbose: print(log)
-               self.log_count += 1
-               self.emps.add(log)
-            else:
-               self.left = log.left 
-               if self.verbose: print("found left=%s" % binascii.hexlify(self.left))
-               break
+             self.left = bytearray()
+             self.add_logs(rec)
+             if self.end:
+                self.count += 1
+                return
+
+          # all complete records in one pass
+          n = (len(body) - i) // l * l
+          self.add_logs(body[i:i+n])
+          if not self.end:
+             # receive less than record
+             self.left = bytearray(body[i+n:])
+             if self.verbose and self.left: print("found left=%s" % binascii.hexlify(self.left))
 
           if self.verbose: print("count emp=%s" % self.emps.count)
           self.count += 1
           return
-            
+
+      def add_logs(self, data):
+          '''
+          decode records and add them to employee
+
+          @data records of 12 bytes
+          '''
+          t = perf_counter()
+          logs = decode_logs(data, self.tz)
+          if self.timer: self.timer('decode', perf_counter() - t)
+          if self.verbose:
+             for k in range(logs.count): print(logs.log(k))
+          first = 0
+          if self.verify is not None and logs.count:
+             # last record of the previous session must still be there
+             if int(logs.ts[0]) != self.verify:
+                if self.verbose: print('log changed, cursor reset')
+                self.reset = self.end = True
+                return logs
+             self.verify = None
+             first = 1
+          self.records += logs.count
+          if logs.count: self.last_ts = int(logs.ts[logs.count - 1])
+          self.log_count += logs.count - first
+          self.emps.add_logs(logs, first)
+          if logs.end: self.end = True
+          return logs
+
+      def resume(self, cursor):
+          '''
+          continue after the last record of a previous session, returns
+          the page to start reading from
+
+          @cursor {'size': page size, 'records': records read, 'ts': time of last record}
+          '''
+          size = cursor['size']
+          last = cursor['records'] - 1
+          page = last * LOG_SIZE // size
+          self.drop = last * LOG_SIZE - page * size
+          self.records = last
+          self.verify = cursor.get('ts', 0)
+          return page
+
+      def cursor(self, size):
+          '''
+          position after the last record read, for resume
+
+          @size page size used
+          '''
+          if not self.records: return None
+          return {
+              'page': (self.records * LOG_SIZE) // size,
+              'size': size,
+              'records': self.records,
+              'ts': self.last_ts,
+              'confirmed': True,
+          }
+
+class fk_unreachable(ConnectionError):
+      '''
+      machine failed lately and is not tried until its backoff is over
+      '''
+
+class fk_connection(object):
+      '''
+      one asyncio stream to a finger machine, kept open between requests
+      '''
+      def __init__(self, host, port, timeout=5):
+          self.host = host
+          ''' finger machine ip/address '''
+          self.port = port
+          ''' finger machine port '''
+          self.timeout = timeout
+          ''' connection timeout '''
+          self.reader = None
+          self.writer = None
+          self.lock = asyncio.Lock()
+          ''' one request/response exchange at a time '''
+          self.used = 0
+          ''' number of exchanges done on the current stream '''
+          self.buf = bytearray()
+          ''' received bytes not yet returned as a response '''
+          self.used_buf = 0
+          ''' size of the response at the start of buf handed out last '''
+          self.keepalive = True
+          ''' machine keeps the stream open after a response '''
+          self.last_used = 0
+          ''' loop time of the last finished exchange '''
+          self.timer = None
+          ''' called with (stage, seconds) for connect, send and receive, None = not timed '''
+          self.failures = 0
+          ''' failed sessions in a row '''
+          self.retry_at = 0
+          ''' loop time before which a failing machine is not tried '''
+
+      @property
+      def healthy(self):
+          '''
+          stream is open and the machine has not closed it
+          '''
+          return self.writer is not None and not self.writer.is_closing() \
+                 and not self.reader.at_eof()
+
+      async def open(self):
+          '''
+          (re)open the stream if it is not healthy
+          '''
+          if self.healthy: return
+          await self.close()
+          t = perf_counter()
+          self.reader, self.writer = await asyncio.wait_for(
+              asyncio.open_connection(self.host, self.port), self.timeout)
+          self.used = 0
+          if self.timer: self.timer('connect', perf_counter() - t)
+
+      async def probe(self):
+          '''
+          cheap liveness check before a session: fail at once while the
+          machine is backing off, else make sure it accepts a connection.
+          once the backoff is over one session goes through (half open),
+          the others fail until it tells whether the machine is back
+          '''
+          if self.failures:
+             now = asyncio.get_running_loop().time()
+             if now < self.retry_at:
+                raise fk_unreachable('%s:%s failed %s times, retry in %.0f s'
+                                     % (self.host, self.port, self.failures, self.retry_at - now))
+             self.retry_at = now + BACKOFF_MIN
+          async with self.lock:
+              await self.open()
+
+      def failed(self):
+          '''
+          a session failed, do not try the machine for a while, twice as long
+          after each failure in a row
+          '''
+          self.failures += 1
+          delay = min(BACKOFF_MIN * 2 ** (self.failures - 1), BACKOFF_MAX)
+          # machines that went down together are not retried together
+          self.retry_at = asyncio.get_running_loop().time() + delay * random.uniform(0.8, 1)
+
+      def recovered(self):
+          '''
+          a session succeeded, the machine is tried again as usual
+          '''
+          self.failures = 0
+          self.retry_at = 0
+
+      async def close(self):
+          '''
+          close the stream
+          '''
+          writer = self.writer
+          self.reader = self.writer = None
+          self.buf = bytearray()
+          self.used_buf = 0
+          if writer is None: return
+          writer.close()
+          try:
+              await writer.wait_closed()
+          except (OSError, asyncio.CancelledError):
+              pass
+
+      async def exchange(self, exp, req):
+          '''
+          send request and receive response, reconnect once when a
+          kept-alive stream turns out to be dead
+
+          @exp expected size
+          @req request packet
+          '''
+          async with self.lock:
+              for retry in (False, True):
+                  await self.open()
+                  reused = self.used > 0
+                  try:
+                      await self.send(req)
+                      data = await self.read_frame(exp)
+                  except (OSError, asyncio.TimeoutError) as err:
+                      await self.close()
+                      if retry or not reused or isinstance(err, asyncio.TimeoutError): raise
+                      self.dropped()
+                      continue
+                  self.done()
+                  return data
+
+      def done(self, count=1):
+          '''
+          record finished exchanges, close the stream if the machine
+          does not keep it open anyway
+
+          @count number of exchanges
+          '''
+          self.used += count
+          self.last_used = asyncio.get_running_loop().time()
+          if not self.keepalive and self.writer is not None:
+             self.writer.close()
+             self.reader = self.writer = None
+             self.buf = bytearray()
+             self.used_buf = 0
+
+      def dropped(self):
+          '''
+          the machine closed a stream we kept open, stop keeping streams
+          open when it did so right after a response
+          '''
+          if asyncio.get_running_loop().time() - self.last_used < KEEPALIVE_PROBE:
+             self.keepalive = False
+
+      async def send(self, *reqs):
+          '''
+          send requests without waiting for the responses
+
+          @reqs request packets
+          '''
+          t = perf_counter()
+          self.writer.write(b''.join(reqs))
+          await asyncio.wait_for(self.writer.drain(), self.timeout)
+          if self.timer: self.timer('send', perf_counter() - t)
+
+      async def read_frame(self, exp):
+          '''
+          receive one response: @exp bytes, or less when the next response
+          header or an idle gap shows the machine sent a short one
+
+          @exp expected size
+          '''
+          self.compact()
+          t = perf_counter()
+          while True:
+              n = self.frame_end(exp)
+              if n: break
+              wait = FRAME_IDLE if len(self.buf) >= HEAD_SIZE else self.timeout
+              try:
+                  data = await asyncio.wait_for(self.reader.read(max(exp, 4096)), wait)
+              except asyncio.TimeoutError:
+                  if len(self.buf) < HEAD_SIZE: raise
+                  data = None
+              if not data:
+                 if data is not None and len(self.buf) < HEAD_SIZE:
+                    raise ConnectionResetError('connection closed by %s' % self.host)
+                 # short response, nothing more is coming
+                 n = min(len(self.buf), exp)
+                 break
+              self.buf += data
+
+          self.used_buf = n
+          if self.timer: self.timer('receive', perf_counter() - t)
+          return memoryview(self.buf)[:n]
+
+      def compact(self):
+          '''
+          drop the response handed out by the last read_frame
+          '''
+          n = self.used_buf
+          if not n: return
+          self.used_buf = 0
+          try:
+              del self.buf[:n]
+          except BufferError:
+              # a view of the last response is still alive
+              self.buf = bytearray(self.buf[n:])
+
+      def frame_end(self, exp):
+          '''
+          size of the complete response at the start of the buffer, 0 if
+          more data is needed
+
+          @exp expected size
+          '''
+          buf = self.buf
+          # drop anything before a response header
+          i = buf.find(HEAD_START)
+          if i < 0:
+             del buf[:max(len(buf) - len(HEAD_START) + 1, 0)]
+             return 0
+          if i: del buf[:i]
+          if len(buf) < HEAD_SIZE: return 0
+
+          # next response already here
+          i = buf.find(HEAD_START, HEAD_SIZE, exp + len(HEAD_START) - 1)
+          while i >= 0 and i + HEAD_SIZE <= len(buf):
+              if buf[i+HEAD_SIZE-2:i+HEAD_SIZE] == HEAD_END: return i
+              i = buf.find(HEAD_START, i + 1, exp + len(HEAD_START) - 1)
+          if i >= 0 and i < exp: return 0
+
+          return exp if len(buf) >= exp else 0
+
+class fk_pool(object):
+      '''
+      keep one connection per finger machine (host, port)
+      '''
+      def __init__(self):
+          self.connections = {}
+          ''' keypair of (host, port):fk_connection '''
+
+      def get(self, host, port, timeout=5):
+          '''
+          connection for a finger machine, created on first use
+          '''
+          conn = self.connections.get((host, port))
+          if conn is None:
+             conn = self.connections[(host, port)] = fk_connection(host, port, timeout)
+          conn.timeout = timeout
+          return conn
+
+      async def close(self):
+          '''
+          close all connections
+          '''
+          conns = list(self.connections.values())
+          self.connections = {}
+          for conn in conns:
+              await conn.close()
+
+class fk_aio_class(fk_class):
+      '''
+      asyncio version of fk_class, same parsing but never blocks the event loop
+      '''
+      def __init__(self, host, port, timeout=5, verbose=True, tz=None, emps=None, pool=None, timer=None):
+          super().__init__(host, port, timeout=timeout, verbose=verbose, tz=tz, emps=emps, timer=timer)
+          self.pool = pool
+          ''' fk_pool holding the connection to the finger machine '''
+
+      def connection(self):
+          '''
+          pooled connection to the finger machine, timed by this session
+          '''
+          conn = self.pool.get(self.host, self.port, self.timeout)
+          conn.timer = self.timer
+          return conn
+
+      async def async_send(self, exp, part1, num, part2):
+          """
+          send data to fk
+
+          @exp expected response size, header included
+          @part1 command part
+          @num set number start from 0
+          @part2 suffix part (session ?)
+          """
+          req = self.request(part1, num, part2)
+          if self.verbose: print(binascii.hexlify(req))
+          if self.verbose: print("expect size=%s" % exp)
+
+          conn = self.connection()
+          data = bytearray(await conn.exchange(exp, req))
+          if self.verbose: print("receive size=%s" % len(data))
+          return data
+
+      async def async_read_user(self, exp, part1, num, part2):
+          '''
+          read all user id
+
+          @exp expected size
+          @part1 command part
+          @num set number start from 0
+          @part2 suffix part (session ?)
+          '''
+          data = await self.async_send(exp, part1, num, part2)
+          self.parse_user(data)
+
+      async def async_read_user_page(self, num):
+          '''
+          read one page of user id, returns True when the page is full
+          and more users may follow
+
+          @num page number start from 0
+          '''
+          data = await self.connection().exchange(HEAD_SIZE + USER_SIZE, user_request(num))
+          if len(data) < HEAD_SIZE + USER_SIZE: self.complete = False
+          return self.parse_user(data) == USER_SIZE // USER_SLOT
+
+      async def async_read_username(self, exp, part1, num, part2):
+          '''
+          read user name
+
+          @exp expected size
+          @part1 command part
+          @num set number start from 0
+          @part2 suffix part (session ?)
+          '''
+          if num == 0: return
+
+          data = await self.async_send(exp, part1, num, part2)
+          self.parse_username(num, data)
+
+      async def async_read_usernames(self, nums, window=1):
+          '''
+          read user names, keeping up to @window requests in flight
+
+          @nums user numbers
+          @window number of requests in flight
+          '''
+          conn = self.connection()
+          todo = deque(num for num in nums if num)
+          while todo:
+              if window > 1 and conn.keepalive:
+                 try:
+                     await self._read_username_window(conn, todo, window)
+                     return
+                 except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+                     # machine closes the stream after each response
+                     conn.dropped()
+                     if conn.keepalive: raise
+                     continue
+
+              # one user at a time
+              num = todo[0]
+              req = username_request(num)
+              data = await conn.exchange(response_size(req), req)
+              todo.popleft()
+              self.parse_username(num, data)
+
+      async def _read_username_window(self, conn, todo, window):
+          '''
+          read user names of @todo, @window requests in flight, users are
+          removed from @todo as their names arrive
+
+          @conn fk_connection
+          @todo deque of user numbers
+          @window number of requests in flight
+          '''
+          async with conn.lock:
+              await conn.open()
+              pending = 0
+              count = 0
+              try:
+                  while todo:
+                      # keep the window full
+                      reqs = [username_request(todo[k]) for k in range(pending, min(window, len(todo)))]
+                      if reqs: await conn.send(*reqs)
+                      pending += len(reqs)
+
+                      data = await conn.read_frame(HEAD_SIZE + NAME_SIZE)
+                      pending -= 1
+                      count += 1
+                      self.parse_username(todo.popleft(), data)
+              except (OSError, asyncio.TimeoutError):
+                  await conn.close()
+                  raise
+              conn.done(count)
+
+      async def async_read_log(self, exp, part1, num, part2):
+          '''
+          read log
+
+          @exp expected size
+          @part1 command part
+          @num set number start from 0
+          @part2 suffix part (session ?)
+          '''
+          data = await self.async_send(exp, part1, num, part2)
+          self.parse_log(data)
+
+      async def async_read_log_pages(self, mode, window=1, size=PAGE_SIZE, cursor=None):
+          '''
+          read all log pages, keeping up to @window page requests in flight
+
+          @mode 0xa4 all / 0xa1 new
+          @window number of page requests in flight
+          @size page size to ask for, falls back to what the machine sends
+          @cursor position of a previous session (see cursor), read only what follows
+          '''
+          conn = self.connection()
+
+          if cursor and cursor.get('records'):
+             size = cursor['size']
+             if size < PAGE_SIZE or (size % PAGE_SIZE and size % LOG_SIZE):
+                # neither asked for nor whole records (cursor of an older version)
+                size = PAGE_SIZE
+             self.page = self.resume(dict(cursor, size=size))
+             data = await conn.exchange(HEAD_SIZE + size, log_request(mode, self.page, size))
+             confirmed = size == PAGE_SIZE or cursor.get('confirmed', False)
+             if not confirmed and len(data) < HEAD_SIZE + size:
+                # short page: end of the log, or a machine capping the page
+                # size (cursor of an older version), go on in pages every machine sends
+                size = PAGE_SIZE
+                self.page = self.resume(dict(cursor, size=size))
+                data = await conn.exchange(HEAD_SIZE + size, log_request(mode, self.page, size))
+                confirmed = True
+          else:
+             # first page, also tells which page size the machine accepts
+             self.page = 0
+             data = await conn.exchange(HEAD_SIZE + size, log_request(mode, 0, size))
+             if size != PAGE_SIZE and len(data) <= HEAD_SIZE:
+                size = PAGE_SIZE
+                data = await conn.exchange(HEAD_SIZE + size, log_request(mode, 0, size))
+             confirmed = size == PAGE_SIZE or len(data) == HEAD_SIZE + size
+             if not confirmed and len(data) >= HEAD_SIZE + PAGE_SIZE:
+                # short page: end of the log, the largest page the machine
+                # sends, or a response cut short
+                short = len(data) - HEAD_SIZE
+                if short % LOG_SIZE:
+                   # not whole records, go on in pages every machine sends
+                   size = PAGE_SIZE
+                   data = data[:HEAD_SIZE + size]
+                   confirmed = True
+                else:
+                   more = await conn.exchange(HEAD_SIZE + short, log_request(mode, 1, short))
+                   if len(more) > HEAD_SIZE:
+                      # records follow page 0, a second full page confirms the size
+                      size = short
+                      confirmed = len(more) == HEAD_SIZE + size
+                      self.parse_log(data)
+                      data = more
+                      self.page = 1
+          if self.verbose: print("page size=%s" % size)
+          # a size the machine never sent a full page of may be above its
+          # limit, a later session would take its short pages for the end
+          self.size = size if confirmed else PAGE_SIZE
+
+          self.page += 1
+          self.parse_log(data)
+          if not self.end and len(data) - HEAD_SIZE == size:
+             # few new records expected after a cursor, grow the window from 1
+             await self._read_log_rest(conn, mode, window, size, 1 if cursor else window)
+
+          if self.verify is not None:
+             # nothing where the last record was
+             self.reset = self.end = True
+
+      async def _read_log_rest(self, conn, mode, window, size, start=1):
+          '''
+          read log pages from self.page on until the end of the log
+
+          @conn fk_connection
+          @mode 0xa4 all / 0xa1 new
+          @window number of page requests in flight
+          @size page size
+          @start window to begin with, doubled after each page up to @window
+          '''
+          while self.page <= 0xffff:
+              if window > 1 and conn.keepalive:
+                 try:
+                     await self._read_log_window(conn, mode, window, size, start)
+                     return
+                 except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+                     # machine closes the stream after each response
+                     conn.dropped()
+                     if conn.keepalive: raise
+                     continue
+
+              # one page at a time
+              if self.verbose: print('reading set %s' % self.page)
+              data = await conn.exchange(HEAD_SIZE + size, log_request(mode, self.page, size))
+              self.page += 1
+              self.parse_log(data)
+              if self.end or len(data) - HEAD_SIZE < size: return
+
+      async def _read_log_window(self, conn, mode, window, size, start=1):
+          '''
+          read log pages from self.page on, @window requests in flight
+
+          @conn fk_connection
+          @mode 0xa4 all / 0xa1 new
+          @window number of page requests in flight
+          @size page size
+          @start window to begin with, doubled after each page up to @window
+          '''
+          async with conn.lock:
+              await conn.open()
+              sent = self.page
+              pending = 0
+              win = max(min(start, window), 1)
+              try:
+                  while True:
+                      # keep the window full
+                      reqs = []
+                      while pending + len(reqs) < win and sent <= 0xffff:
+                          reqs.append(log_request(mode, sent, size))
+                          sent += 1
+                      if reqs: await conn.send(*reqs)
+                      pending += len(reqs)
+                      if not pending: break
+
+                      if self.verbose: print('reading set %s' % self.page)
+                      data = await conn.read_frame(HEAD_SIZE + size)
+                      pending -= 1
+                      self.page += 1
+                      self.parse_log(data)
+                      if self.end or len(data) - HEAD_SIZE < size: break
+                      win = min(win * 2, window)
+
+                  # responses for pages past the end
+                  while pending:
+                      await conn.read_frame(HEAD_SIZE + size)
+                      pending -= 1
+              except (OSError, asyncio.TimeoutError):
+                  await conn.close()
+                  raise
+              conn.done(sent - self.page + 1)
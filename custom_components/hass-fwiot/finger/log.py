@@ -1,4 +1,12 @@
 import binascii
+import struct
+import datetime
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class finger_log():
     unknown = ''
@@ -13,6 +21,8 @@ class finger_log():
     ''' time in hex'''
     time = ''
     ''' time (string)'''    
+    ts = 0
+    ''' time (utc epoch) '''
     empty = False
     ''' this record empty? '''
     left = []
@@ -37,14 +47,7 @@ class finger_log():
 
         @h hex string
         '''
-        ys = 1964
-        bh = bin(h)[2:]
-        yy = bh[:6]
-        mm = bh[8:12]
-        dd = bh[19:24]
-        MM = bh[24:30]
-        HH = bh[30:32] + bh[16:19]       
-        return '%02d/%02d/%s %02d:%02d' % (int(dd,2),int(mm,2),int(yy,2) + ys,int(HH,2),int(MM,2))          
+        return '%02d/%02d/%s %02d:%02d' % hex_to_fields(h)
 
     def read(self, data):
         '''
@@ -71,4 +74,234 @@ class finger_log():
         self.second = data[7:8][0]
         #self.timeh = binascii.hexlify(data[8:])
         self.time = self.hex_to_time(int.from_bytes(data[8:], byteorder='big'))
-        return
\ No newline at end of file
+        return
+
+def hex_to_fields(h):
+    '''
+    convert hex to (day, month, year, hour, minute)
+
+    @h hex string
+    '''
+    ys = 1964
+    bh = bin(h)[2:]
+    yy = bh[:6]
+    mm = bh[8:12]
+    dd = bh[19:24]
+    MM = bh[24:30]
+    HH = bh[30:32] + bh[16:19]
+    return (int(dd,2),int(mm,2),int(yy,2) + ys,int(HH,2),int(MM,2))
+
+LOG_SIZE = 12
+''' size of one log record '''
+LOG_RECORD = struct.Struct('<I3sBI')
+''' userid, unknown, second, time (byte swapped) '''
+NUMPY_MIN = 256
+''' use numpy from this number of records on, when installed '''
+
+class finger_logs():
+    '''
+    log records decoded as columns, same values as finger_log
+    '''
+    __slots__ = ('count', 'user', 'second', 'year', 'month', 'day', 'hour', 'minute', 'ts', 'end')
+
+    def __init__(self):
+        self.count = 0
+        ''' number of records '''
+        self.user = array('I')
+        ''' user number '''
+        self.second = array('B')
+        self.year = array('H')
+        self.month = array('B')
+        self.day = array('B')
+        self.hour = array('B')
+        self.minute = array('B')
+        self.ts = array('q')
+        ''' utc epoch, 0 for an invalid date '''
+        self.end = False
+        ''' stopped at an empty record '''
+
+    def id(self, k):
+        '''
+        userid of record @k, like finger_log.id
+        '''
+        return '%02d' % self.user[k]
+
+    def time(self, k):
+        '''
+        date + time string of record @k, like finger_log.time
+        '''
+        return '%02d/%02d/%s %02d:%02d' % (self.day[k], self.month[k], self.year[k], self.hour[k], self.minute[k])
+
+    def log(self, k):
+        '''
+        record @k as finger_log
+        '''
+        log = finger_log()
+        log.id = self.id(k)
+        log.second = int(self.second[k])
+        log.time = self.time(k)
+        log.ts = int(self.ts[k])
+        return log
+
+def decode_logs(data, tz=None):
+    '''
+    decode all complete records of a buffer in one pass, stop at the
+    first empty record
+
+    @data bytes/bytearray/memoryview, records of 12 bytes
+    @tz finger_tz of the machine, default = utc
+    '''
+    if tz is None: tz = UTC
+    view = memoryview(data).cast('B')
+    view = view[:len(view) - len(view) % LOG_SIZE]
+    if np is not None and len(view) >= NUMPY_MIN * LOG_SIZE:
+       return _decode_logs_numpy(view, tz)
+
+    logs = finger_logs()
+    user = logs.user; second = logs.second
+    year = logs.year; month = logs.month; day = logs.day
+    hour = logs.hour; minute = logs.minute
+    for uid, unknown, sec, t in LOG_RECORD.iter_unpack(view):
+        if not (uid or sec or t) and unknown == b'\0\0\0':
+           logs.end = True
+           break
+        # userid = first 8 significant bits
+        user.append(uid >> max(uid.bit_length() - 8, 0))
+        second.append(sec)
+        t = ((t & 0xff) << 24) | ((t & 0xff00) << 8) | ((t >> 8) & 0xff00) | (t >> 24)
+        if t >> 31:
+           year.append((t >> 26) + 1964)
+           month.append((t >> 20) & 0xf)
+           day.append((t >> 8) & 0x1f)
+           hour.append(((t & 3) << 3) | ((t >> 13) & 7))
+           minute.append((t >> 2) & 0x3f)
+        else:
+           # less than 32 significant bits, fields move, decode like finger_log
+           try:
+               dd, mm, yy, HH, MM = hex_to_fields(t)
+           except ValueError:
+               # less than 24 bits, no time, month 0 gives ts = 0
+               dd, mm, yy, HH, MM = 0, 0, 1964, 0, 0
+           year.append(yy); month.append(mm); day.append(dd); hour.append(HH); minute.append(MM)
+    logs.count = len(user)
+
+    days = tz.days
+    ts = logs.ts
+    for y, m, d, H, M, S in zip(year, month, day, hour, minute, second):
+        k = (y, m, d)
+        day0 = days[k] if k in days else tz.day(y, m, d)
+        if day0 is None or H > 23 or M > 59 or S > 59:
+           ts.append(0)
+           continue
+        local = day0 + H * 3600 + M * 60 + S
+        ts.append(local - tz.offset(local // 3600))
+    return logs
+
+LOG_DTYPE = np.dtype([('a', '<u8'), ('t', '>u4')]) if np is not None else None
+''' record as userid + unknown + second, time '''
+
+def _decode_logs_numpy(view, tz):
+    '''
+    decode_logs with numpy structured arrays
+    '''
+    rec = np.frombuffer(view, dtype=LOG_DTYPE)
+    a = rec['a']; t = rec['t'].astype(np.uint32)
+    empty = np.flatnonzero((a == 0) & (t == 0))
+
+    logs = finger_logs()
+    if len(empty):
+       logs.end = True
+       a = a[:empty[0]]; t = t[:empty[0]]
+
+    uid = (a & 0xffffffff).astype(np.uint32)
+    # userid = first 8 significant bits
+    bits = np.frexp(uid.astype(np.float64))[1]
+    logs.user = uid >> np.maximum(bits - 8, 0).astype(np.uint32)
+    logs.second = (a >> 56).astype(np.uint8)
+    logs.year = ((t >> 26) + 1964).astype(np.uint16)
+    logs.month = ((t >> 20) & 0xf).astype(np.uint8)
+    logs.day = ((t >> 8) & 0x1f).astype(np.uint8)
+    logs.hour = (((t & 3) << 3) | ((t >> 13) & 7)).astype(np.uint8)
+    logs.minute = ((t >> 2) & 0x3f).astype(np.uint8)
+
+    # less than 32 significant bits, fields move, decode like finger_log
+    for k in np.flatnonzero(t < 0x80000000):
+        try:
+            dd, mm, yy, HH, MM = hex_to_fields(int(t[k]))
+        except ValueError:
+            # less than 24 bits, no time, month 0 gives ts = 0
+            dd, mm, yy, HH, MM = 0, 0, 1964, 0, 0
+        logs.year[k] = yy; logs.month[k] = mm; logs.day[k] = dd
+        logs.hour[k] = HH; logs.minute[k] = MM
+    logs.count = len(uid)
+
+    # local epoch, days from civil
+    y = logs.year.astype(np.int64); m = logs.month.astype(np.int64); d = logs.day.astype(np.int64)
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + np.where(m > 2, -3, 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    local = (era * 146097 + doe - 719468) * 86400 \
+            + logs.hour.astype(np.int64) * 3600 + logs.minute.astype(np.int64) * 60 \
+            + logs.second.astype(np.int64)
+
+    # machine timezone, one lookup per distinct hour
+    hours, where = np.unique(local // 3600, return_inverse=True)
+    offsets = np.fromiter((tz.offset(int(h)) for h in hours), dtype=np.int64, count=len(hours))
+    ts = local - offsets[where.reshape(-1)]
+
+    dim = DAYS_IN_MONTH[np.clip(logs.month, 0, 12)]
+    leap = (logs.month == 2) & (logs.year % 4 == 0) & ((logs.year % 100 != 0) | (logs.year % 400 == 0))
+    valid = (logs.month >= 1) & (logs.month <= 12) & (logs.day >= 1) & (logs.day <= dim + leap) \
+            & (logs.hour <= 23) & (logs.minute <= 59) & (logs.second <= 59)
+    logs.ts = np.where(valid, ts, 0)
+    return logs
+
+DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64) if np is not None else None
+
+class finger_tz():
+    '''
+    timezone of a finger machine, turns local time into utc epoch with
+    one timezone lookup per distinct hour
+    '''
+    __slots__ = ('tz', 'offsets', 'days')
+
+    def __init__(self, tz=None):
+        self.tz = tz
+        ''' tzinfo (pytz or zoneinfo), None = utc '''
+        self.offsets = {}
+        ''' keypair of local hour since epoch:utc offset seconds '''
+        self.days = {}
+        ''' keypair of (year, month, day):local epoch of midnight, None invalid '''
+
+    def day(self, y, m, d):
+        '''
+        local epoch of midnight, None for an invalid date
+        '''
+        try:
+            day0 = (datetime.date(y, m, d).toordinal() - EPOCH_ORDINAL) * 86400
+        except ValueError:
+            day0 = None
+        self.days[(y, m, d)] = day0
+        return day0
+
+    def offset(self, hour):
+        '''
+        utc offset in seconds at local hour since epoch
+        '''
+        off = self.offsets.get(hour)
+        if off is None:
+           off = 0
+           if self.tz is not None:
+              naive = datetime.datetime(1970, 1, 1) + datetime.timedelta(hours=hour)
+              if hasattr(self.tz, 'localize'):
+                 local = self.tz.localize(naive)
+              else:
+                 local = naive.replace(tzinfo=self.tz)
+              off = int(local.utcoffset().total_seconds())
+           self.offsets[hour] = off
+        return off
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+UTC = finger_tz()
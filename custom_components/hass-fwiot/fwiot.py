@@ -1,5 +1,11 @@
-import requests
 import json
+import random
+import time
+import cProfile
+import pstats
+import tracemalloc
+from bisect import bisect_left
+from collections import deque
 import datetime
 import pytz
 import aiohttp
@@ -8,25 +14,100 @@ from typing import Any
 from datetime import timedelta
 import async_timeout
 
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.helpers.entity import Entity, DeviceInfo
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.helpers.restore_state import RestoreEntity, RestoredExtraData
+import homeassistant.util.dt as dt_util
 
 from homeassistant.const import (
-    DEVICE_CLASS_TIMESTAMP
+    DEVICE_CLASS_TIMESTAMP,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
 )
 from homeassistant.helpers.aiohttp_client import (
     async_aiohttp_proxy_web,
     async_get_clientsession,
 )
-from .const import DOMAIN, LOGGER, DEVICES_READY,\
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers import entity_registry as er
+from .const import DOMAIN, LOGGER, DEVICES_READY, POLLING_TIMEOUT_SEC, DEFAULT_BASE_URL,\
+                   TIMING_WINDOW, TIMING_BUCKETS_MS, PROFILE_TOP,\
+                   EVENT_RECORD, ATTR_RECORD_ID, ATTR_RECORD, ATTR_DEVICE, ATTR_DEVICE_NAME, ATTR_DEVICE_TYPE,\
+                   HUB_CONCURRENCY, SNAPSHOT_TTL, FETCH_PAGES, ROSTER_RECHECK, ROSTER_MISSING, FETCH_LIMIT_MIN, FETCH_LIMIT_MAX,\
+                   DEFAULT_CACHEDB, CACHE_VERSION, CACHE_SAVE_DELAY,\
                    DEVICES_ICON,\
                    DEVICE_FINGER,\
                    DEVICE_EMPDETECTOR,\
                    DEVICE_THERMIDITY
 
 from .finger.finger import finger_reader
+from .finger.helper import fk_pool, fk_unreachable
+from .finger.log import finger_tz
+
+class FWIOTTimings:
+    """Rolling timings of the stages of device updates."""
+
+    def __init__(self, size: int = TIMING_WINDOW) -> None:
+        self.size = size
+        ''' number of timings kept per stage '''
+        self.stages = {}
+        ''' keypair of stage:deque of seconds, oldest first '''
+
+    def add(self, stage, seconds) -> None:
+        ''' record one timing of a stage '''
+        times = self.stages.get(stage)
+        if times is None:
+           times = self.stages[stage] = deque(maxlen=self.size)
+        times.append(seconds)
+
+    def span(self, stage):
+        ''' time a block: with timings.span('json'): ... '''
+        return _span(self, stage)
+
+    def histogram(self, stage):
+        ''' count of timings per bucket, keypair of upper bound in ms:count '''
+        counts = [0] * (len(TIMING_BUCKETS_MS) + 1)
+        for each in self.stages.get(stage, ()):
+            counts[bisect_left(TIMING_BUCKETS_MS, each * 1000)] += 1
+        keys = [str(each) for each in TIMING_BUCKETS_MS] + ['inf']
+        return dict(zip(keys, counts))
+
+    def summary(self):
+        ''' keypair of stage:count, p50, p95 and max in ms '''
+        ret = {}
+        for stage in sorted(self.stages):
+            times = sorted(self.stages[stage])
+            if not times:
+               continue
+            ret[stage] = {
+                'count': len(times),
+                'p50_ms': round(times[len(times) // 2] * 1000, 2),
+                'p95_ms': round(times[min(int(len(times) * 0.95), len(times) - 1)] * 1000, 2),
+                'max_ms': round(times[-1] * 1000, 2),
+            }
+        return ret
+
+class _span:
+    ''' context manager adding the time of its block to a FWIOTTimings '''
+    __slots__ = ('timings', 'stage', 'start')
+
+    def __init__(self, timings, stage):
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+def phase(key, cadence: timedelta) -> timedelta:
+    ''' fixed offset in [0, cadence) of a key, same across restarts '''
+    return timedelta(seconds=random.Random(str(key)).random() * cadence.total_seconds())
 
 class FWIOTDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
     """Class to manage fetching AccuWeather data API."""
@@ -39,91 +120,310 @@ class FWIOTDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self._hass = hass
         self._device = device
         """Initialize."""
-        # Enabling the forecast download increases the number of requests per data
-        # update, we use 40 minutes for current condition only and 80 minutes for
-        # current condition and forecast as update interval to not exceed allowed number
-        # of requests. We have 50 requests allowed per day, so we use 36 and leave 14 as
-        # a reserve for restarting HA.
-        update_interval = timedelta(seconds=10)
-        print("Data will be update every %s" % update_interval)
-
-        super().__init__(hass, LOGGER, name=DOMAIN, update_interval=update_interval)
+        self._cadence = device.cadence
+        ''' time between two reads of the machine '''
+
+        self._uid_listeners = {}
+        ''' keypair of userid:callbacks of entities of this user '''
+        self._uid_remove = None
+        ''' remove the listener that keeps refresh scheduled for user entities '''
+        self._changed = None
+        ''' userid with a new log since listeners were called, None = all '''
+        self._listen_state = None
+        ''' update success and staleness when listeners were called '''
+
+        # first run is shifted by a fixed phase so machines set up together
+        # are not read at the same instant
+        super().__init__(hass, LOGGER, name=DOMAIN,
+                         update_interval=self._cadence + phase(device._key, self._cadence))
     
     async def _async_update_data(self) -> dict[str, Any]:
         """Update data via library."""
+        if self.data is not None:
+           self.update_interval = self._cadence
 
-        if self._device.type == DEVICE_FINGER:
+        with self._device.timings.span('update'):
            return await self._async_get_finger() 
+
+    @callback
+    def async_add_uid_listener(self, uid, update_callback):
+        ''' listen to logs of one user
+
+        return function to remove the listener
+        '''
+        listeners = self._uid_listeners.setdefault(uid, [])
+        listeners.append(update_callback)
+        if self._uid_remove is None:
+           self._uid_remove = self.async_add_listener(lambda: None)
+
+        @callback
+        def remove():
+            listeners.remove(update_callback)
+            if not listeners:
+               self._uid_listeners.pop(uid, None)
+            if not self._uid_listeners and self._uid_remove:
+               self._uid_remove()
+               self._uid_remove = None
+        return remove
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Call all listeners, and user listeners of users with a new log."""
+        super().async_update_listeners()
+        state = (self.last_update_success, self._device.stale)
+        if self._changed is None or state != self._listen_state:
+           uids = list(self._uid_listeners)
         else:
-           return await self._async_get_fwiot()
+           uids = [uid for uid in self._changed if uid in self._uid_listeners]
+        self._listen_state = state
+        self._changed = set()
+        for uid in uids:
+            for update_callback in list(self._uid_listeners.get(uid, ())):
+                update_callback()
 
     async def _async_get_finger(self) -> dict[str, Any]:
         if not self._device._raw.get('port', 0):
-           return
+           return self.data
         if not self._device._raw.get('serial', ''):
-           return
-
-        if self._device._every < 1:
-           self._device._every = 5
-
-        if datetime.datetime.now().timestamp() < self._device._last_connect + (self._device._every * 60):
-           return {}
+           return self.data
 
         fk_reader = finger_reader()
         fk_reader.port = self._device._raw.get('port',0)
         fk_reader.host = self._device._raw.get('serial','')
-
-        fk_reader.mode = 'new'
-        r = fk_reader.read_log()
+        fk_reader.pool = self._device._sys.finger_pool
+        fk_reader.tz = self._device._tzinfo
+        fk_reader.by_id = True
+        fk_reader.timer = self._device.timings.add
+
+        # continue after the last record read, even across restarts
+        cache = self._device._sys.cache
+        await cache.async_load()
+        ck = '%s:%s' % (fk_reader.host, fk_reader.port)
+        fk_reader.mode = 'all'
+        fk_reader.cursor = cache.get_cursor(ck)
+        try:
+            r = await fk_reader.async_read_log()
+        except (OSError, asyncio.TimeoutError) as err:
+            # last data, or state restored at startup, is kept until stale
+            # a machine backing off fails at once, it was logged when it failed
+            log = LOGGER.debug if isinstance(err, fk_unreachable) else LOGGER.warning
+            if not self._device.stale:
+               log('Error reading %s, last data kept: %s', fk_reader.host, err)
+               return self.data if self.data is not None else {}
+            raise UpdateFailed('Error reading %s: %s' % (fk_reader.host, err)) from err
+        cache.set_cursor(ck, fk_reader.cursor)
         # finish read
         self._device._last_connect = datetime.datetime.now().timestamp()
-        return r
+        # only users with new logs are read, others keep their last log
+        data = dict(self.data or {})
+        changed = {uid for uid in r if data.get(uid) != r[uid]}
+        data.update(r)
+        if self._changed is not None:
+           self._changed |= changed
+        return data
+
+class FWIOTHubCoordinator(DataUpdateCoordinator[dict[str, Any]]):
+    """Fetch data of all cloud devices in one scheduled batch."""
+
+    def __init__(self, hass: HomeAssistant, cadence: timedelta) -> None:
+        self._hass = hass
+        self.devices = {}
+        ''' keypair of api key:cloud device '''
+        self._cadence = cadence
+        ''' time between two batches, shared by all devices of this hub '''
+        name = f"{DOMAIN}_hub_{int(cadence.total_seconds() // 60)}"
 
-    async def _async_get_fwiot(self) -> dict[str, Any]:
-        if self._device._every < 1:
-           self._device._every = 5
+        super().__init__(hass, LOGGER, name=name,
+                         update_interval=cadence + phase(name, cadence))
 
-        if datetime.datetime.now().timestamp() < self._device._last_connect + (self._device._every * 60):
-           return {}
+    async def _async_update_data(self) -> dict[str, Any]:
+        """Update data of every device, a device that failed keeps its slice until it is stale."""
+        if self.data is not None:
+           self.update_interval = self._cadence
+        limit = asyncio.Semaphore(HUB_CONCURRENCY)
+        websession = async_get_clientsession(self.hass)
 
-        url = 'https://iot.frontware.com/json/%s.json?lastid=20&limit=20' % self._device._key
+        async def fetch(device):
+            async with limit:
+               with device.timings.span('update'):
+                  return await self._async_get_fwiot(websession, device)
+
+        keys = list(self.devices)
+        rets = await asyncio.gather(*[fetch(self.devices[each]) for each in keys])
+        data = dict(self.data or {})
+        for key, ret in zip(keys, rets):
+            if ret is not False:
+               data[key] = ret
+               self._fire_events(self.devices[key], ret['events'])
+            elif self.devices[key].stale:
+               data.pop(key, None)
+            elif key in data:
+               data[key] = dict(data[key], events=[])
+        if keys and all(ret is False for ret in rets) and not data \
+           and all(self.devices[each].stale for each in keys):
+           raise UpdateFailed('Error connect to all devices')
+        return data
+
+    async def _async_get_fwiot(self, websession, device) -> dict[str, Any]:
+        ''' data of one device, False on error
+
+        only records after the last id seen are asked for, the latest status
+        and data are kept from the previous slice when nothing newer came;
+        records already on the server at start are read up to the newest
+        one first, in large pages, and fire no event
+        '''
+        prev = (self.data or {}).get(device._key) or {}
+        ret = {k: prev[k] for k in ('status', 'data') if k in prev}
+        ret['events'] = []
+        ''' data records of this update, oldest first '''
+        count = 0
+        lastid = device._lastid
+        history = device._history
         
-        websession = async_get_clientsession(self.hass)
         try:
-            async with async_timeout.timeout(10):
-                response = await websession.get(url)
-
-                if response.status != 200:
-                   raise Exception('status code not 200') 
-
-                rets = await response.json()
-                ret = {}
-                if type(rets) is list:
-                   rets.reverse() 
-                   for each in rets:
-                       if each.get('data', False):
-                          try: 
-                             dd = json.loads(each.get('data')) 
-                          except:
-                             dd = {}  
-
-                          if dd.get('status', False) and not ret.get('status',False):
-                             ret['status'] = dd
-                          elif dd and  not ret.get('data',False):
-                             ret['data'] = dd
-                          
-                          if ret.get('status',False) and ret.get('data',False):
-                             break                    
-
-                # finish read
-                self._device._last_connect = datetime.datetime.now().timestamp()
-                return ret
+            async with async_timeout.timeout(POLLING_TIMEOUT_SEC):
+                page = 0
+                while history or page < FETCH_PAGES:
+                    page += 1
+                    limit = FETCH_LIMIT_MAX if history else device._limit
+                    url = '%s/json/%s.json?lastid=%s&limit=%s' % (device._sys.base_url, device._key, device._lastid or 0, limit)
+
+                    timings = device.timings
+                    with timings.span('request'):
+                       response = await websession.get(url)
+                    async with response:
+                        if response.status != 200:
+                           raise aiohttp.ClientError('status code %s' % response.status) 
+
+                        with timings.span('receive'):
+                           body = await response.read()
+                    with timings.span('json'):
+                       rets = json.loads(body)
+                    with timings.span('parse'):
+                       added = self._add_records(device, rets, ret)
+                    count += added
+
+                    # a full page of new records may have more behind it
+                    if type(rets) is not list or len(rets) < limit or not added:
+                       device._history = False
+                       break
+
+            if history:
+               # records from before the start, newest id reached now
+               ret['events'] = []
+               count = 0
+            # ask for about twice the records seen, next time
+            device._limit = min(max(FETCH_LIMIT_MIN, 2 * count), FETCH_LIMIT_MAX)
+
+            # finish read
+            device._last_connect = datetime.datetime.now().timestamp()
+            return ret
 
         except asyncio.TimeoutError:
-            LOGGER.error("Timeout getting camera image from %s", self.name)
+            LOGGER.error("Timeout getting data of %s", device.name)
 
-        except aiohttp.ClientError as err:
-            LOGGER.error("Error getting new camera image from %s: %s", self.name, err)
+        except (aiohttp.ClientError, ValueError) as err:
+            LOGGER.error("Error getting data of %s: %s", device.name, err)
+        if not history:
+           # read again from the same place next time
+           device._lastid = lastid
+        return False
+
+    @callback
+    def _fire_events(self, device, events) -> None:
+        ''' one event per data record since the last poll, no detection is lost between polls '''
+        for rid, dd in events:
+            self.hass.bus.async_fire(EVENT_RECORD, {
+                ATTR_DEVICE: device.unique_id,
+                ATTR_DEVICE_NAME: device.name,
+                ATTR_DEVICE_TYPE: device.type,
+                ATTR_RECORD_ID: rid,
+                ATTR_RECORD: dd,
+            })
+
+    def _add_records(self, device, rets, ret) -> int:
+        ''' parse records newer than the last id once, oldest first
+
+        return number of new records
+        '''
+        if type(rets) is not list:
+           return 0
+        count = 0
+        for each in rets:
+            try:
+                rid = int(each.get('id'))
+            except (TypeError, ValueError):
+                rid = None
+            if rid is not None:
+               if device._lastid is not None and rid <= device._lastid:
+                  continue
+               device._lastid = rid
+            count += 1
+
+            if not each.get('data', False):
+               continue
+            try: 
+               dd = json.loads(each.get('data')) 
+            except:
+               dd = {}  
+
+            if dd.get('status', False):
+               ret['status'] = dd
+            elif dd:
+               ret['data'] = dd
+               ret['events'].append((rid, dd))
+        return count
+
+class FWIOTCache:
+    """Data kept between restarts, in HA storage."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._store = Store(hass, CACHE_VERSION, DEFAULT_CACHEDB)
+        self.data = None
+        ''' loaded data, None = not loaded yet '''
+
+    async def async_load(self) -> dict:
+        ''' load data once '''
+        if self.data is None:
+           data = await self._store.async_load()
+           if self.data is None:
+              self.data = data or {}
+        return self.data
+
+    def async_save(self) -> None:
+        ''' save data soon, several changes are written once '''
+        self._store.async_delay_save(lambda: self.data, CACHE_SAVE_DELAY)
+
+    def get_cursor(self, key):
+        ''' log cursor of a fingerprint machine '''
+        return (self.data or {}).get('cursors', {}).get(key)
+
+    def set_cursor(self, key, cursor) -> None:
+        ''' set log cursor of a fingerprint machine '''
+        if self.data is None:
+           return
+        cursors = self.data.setdefault('cursors', {})
+        if cursors.get(key) == cursor:
+           return
+        if cursor:
+           cursors[key] = cursor
+        else:
+           cursors.pop(key, None)
+        self.async_save()
+
+    def get_device(self, key):
+        ''' last status of a device, or roster of a fingerprint machine '''
+        return (self.data or {}).get('devices', {}).get(key)
+
+    def set_device(self, key, data) -> None:
+        ''' keep status of a device, or roster of a fingerprint machine '''
+        if self.data is None:
+           return
+        devices = self.data.setdefault('devices', {})
+        if devices.get(key) == data:
+           return
+        devices[key] = data
+        self.async_save()
 
 class FWIOTSystem:
     """System class."""
@@ -137,16 +437,112 @@ class FWIOTSystem:
         '''
         self.devices = {}
         ''' serial devices '''
-
-    def check_finger(self, ip, port, tz, update):
+        self.finger_pool = fk_pool()
+        ''' connections to fingerprint machines, one per (ip, port) '''
+        self.cache = FWIOTCache(hass)
+        ''' data kept between restarts '''
+        self.hubs = {}
+        ''' keypair of cadence:coordinator shared by cloud devices '''
+        self._profiling = False
+        ''' profile service running '''
+        self.base_url = DEFAULT_BASE_URL
+        ''' cloud server, without trailing slash '''
+        self.add_emp_sensors = None
+        ''' add employee sensors of userids of a fingerprint machine, set by sensor platform '''
+
+    def get_coordinator(self, device):
+        ''' coordinator of a device, cloud devices share the hub '''
+        if device.type == DEVICE_FINGER:
+           return FWIOTDataUpdateCoordinator(self._hass, device)
+        hub = self.hubs.get(device.cadence)
+        if hub is None:
+           hub = self.hubs[device.cadence] = FWIOTHubCoordinator(self._hass, device.cadence)
+        hub.devices[device._key] = device
+        return hub
+
+    async def async_close(self):
+        ''' close connections to devices '''
+        await self.finger_pool.close()
+
+    async def async_profile(self, seconds):
+        ''' profile the event loop for @seconds and write a report in config directory
+
+        return path of the report, None when a profile is already running
+        '''
+        if self._profiling:
+           LOGGER.warning('Profile already running')
+           return None
+        self._profiling = True
+        profiler = cProfile.Profile()
+        trace = not tracemalloc.is_tracing()
+        if trace:
+           tracemalloc.start()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            if trace:
+               tracemalloc.stop()
+            self._profiling = False
+
+        path = self._hass.config.path(f"{DOMAIN}_profile_{int(time.time())}.txt")
+        await self._hass.async_add_executor_job(self._write_profile, path, profiler, snapshot, seconds)
+        LOGGER.info('Profile written to %s', path)
+        return path
+
+    def _write_profile(self, path, profiler, snapshot, seconds):
+        ''' write profile report, in executor '''
+        with open(path, 'w') as f:
+            f.write(f"{DOMAIN} profile of {seconds} seconds\n\n")
+            f.write('== timings by device (ms) ==\n')
+            for each in self.devices:
+                timings = self.devices[each].timings
+                f.write(f"\n{self.devices[each].name} ({each})\n")
+                for stage, st in timings.summary().items():
+                    f.write(f"  {stage:8} {st}\n")
+                    f.write(f"  {'':8} {timings.histogram(stage)}\n")
+            f.write('\n== cProfile, by cumulative time ==\n')
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+            f.write('\n== tracemalloc, top allocations ==\n')
+            for stat in snapshot.statistics('lineno')[:PROFILE_TOP]:
+                f.write(f"{stat}\n")
+
+    async def async_read_roster(self, ip, port, known=None, recheck=()):
+        ''' read userid:user code of a fingerprint machine, ({}, False) on error
+
+        return (roster, True when every user list page came in full);
+        only names of users not in @known, or in @recheck, are read
+        '''
         fk_reader = finger_reader()
         fk_reader.port = port
         fk_reader.host = ip
+        fk_reader.pool = self.finger_pool
+        fk_reader.names = known
+        fk_reader.recheck = recheck
 
-        emp = fk_reader.read_user()
+        try:
+            emp = await fk_reader.async_read_user()
+        except (OSError, asyncio.TimeoutError):
+            return {}, False
+        return emp, fk_reader.complete
+
+    async def async_check_finger(self, ip, port, tz, update):
+        # asked by the user, try the machine even while it is backing off
+        self.finger_pool.get(ip, port).recovered()
+        emp, complete = await self.async_read_roster(ip, port)
         if len(emp) == 0:
            raise Exception(5,'Error connect to %s' % ip)
 
+        self.add_finger(ip, port, tz, update, emp)
+        await self.cache.async_load()
+        self.cache.set_device(ip, {'emps': emp})
+        return ip   
+
+    def add_finger(self, ip, port, tz, update, emp):
+        ''' add a fingerprint machine with its roster '''
         if ip in self.devices:
            raise Exception(2,'IP already exist')
 
@@ -160,22 +556,32 @@ class FWIOTSystem:
             'port': port,
             'emps': emp,
             'serial':ip}, ip)
-        return ip   
+        return ip
 
-    def get_device(self, api_key):
-        ''' get device status
+    async def async_fetch_device(self, api_key):
+        ''' get device status from server
 
-        return serial
+        return status
         '''
         
-        url = 'https://iot.frontware.com/status/%s' % api_key
-        r = requests.get(url)
-
-        if r.status_code != 200:
-           raise Exception(1,'Error connect: code %s' % r.status_code)
+        url = '%s/status/%s' % (self.base_url, api_key)
+        websession = async_get_clientsession(self._hass)
+        try:
+            async with async_timeout.timeout(POLLING_TIMEOUT_SEC):
+                async with websession.get(url) as r:
+                    if r.status != 200:
+                       raise Exception(1,'Error connect: code %s' % r.status)
+                    return await r.json(content_type=None)
+        except asyncio.TimeoutError:
+            raise Exception(1,'Error connect: timeout')
+        except (aiohttp.ClientError, ValueError) as err:
+            raise Exception(1,'Error connect: %s' % err)
 
-        rr = json.loads(r.content)
+    def add_device(self, api_key, rr):
+        ''' add a device from its status
 
+        return status
+        '''
         if rr.get('serial') in self.devices:
            raise Exception(2,'Serial already exist')
 
@@ -188,6 +594,104 @@ class FWIOTSystem:
         self.devices[rr.get('serial')] = FWIOTDevice(self, rr, api_key)
         return rr
 
+    async def async_get_device(self, api_key):
+        ''' get device status, add device and keep its status in cache
+
+        return status
+        '''
+        rr = self.add_device(api_key, await self.async_fetch_device(api_key))
+        await self.cache.async_load()
+        self.cache.set_device(api_key, rr)
+        return rr
+
+    async def async_setup_device(self, key, conf):
+        ''' add a device of config entry
+
+        a device seen before is built from cache at once and refreshed later,
+        return True when it must be refreshed
+        '''
+        await self.cache.async_load()
+        cached = self.cache.get_device(key)
+        if conf.get('type','') == 'iot':
+           rr = await self.async_get_device(key) if cached is None else self.add_device(key, cached)
+           self.devices[rr.get('serial')].set_every(conf.get('every', 5))
+           return cached is not None
+
+        pp = conf['port']
+        tz = conf.get('tz','')
+        uu = conf.get('every', conf.get('update',5))
+        if cached is None:
+           await self.async_check_finger(key, pp, tz, uu)
+           return False
+        self.add_finger(key, pp, tz, uu, cached.get('emps', {}))
+        return True
+
+    async def async_refresh_device(self, key):
+        ''' refresh cached status or roster of a device from server '''
+        device = next((dv for dv in self.devices.values() if dv._key == key), None)
+        if device is None:
+           return
+        try:
+           if device.type == DEVICE_FINGER:
+              emp, complete = await self.async_read_roster(key, device._raw.get('port'),
+                                                           device._raw.get('emps'), device.recheck_ids())
+              if len(emp) == 0:
+                 return
+              self.async_update_roster(device, emp, complete)
+              self.cache.set_device(key, {'emps': device._raw['emps']})
+           else:
+              rr = await self.async_fetch_device(key)
+              if rr.get('serial') != device._raw.get('serial'):
+                 LOGGER.warning('Device %s changed serial, reload to use it', key)
+                 return
+              device._raw.update(rr)
+              self.cache.set_device(key, rr)
+        except Exception as e:
+           LOGGER.debug('Refresh of %s failed: %s', key, e)
+
+    @callback
+    def async_update_roster(self, device, emp, complete=True):
+        ''' set roster of a fingerprint machine, add and remove employee sensors
+
+        a user missing from the roster is removed only after ROSTER_MISSING
+        @complete reads in a row without it, until then it is kept in the
+        roster and its sensor is unavailable, a read may have been cut short
+        '''
+        old = device._raw.get('emps') or {}
+        emp = dict(emp)
+        for uid in old:
+            if uid in emp:
+               device.emp_missing.pop(uid, None)
+               continue
+            missing = device.emp_missing.get(uid, 0) + (1 if complete else 0)
+            if missing >= ROSTER_MISSING:
+               device.emp_missing.pop(uid, None)
+            else:
+               device.emp_missing[uid] = missing
+               emp[uid] = old[uid]
+        device._raw['emps'] = emp
+        if self.add_emp_sensors is None:
+           # platform not set up yet, it adds sensors of this roster
+           return
+
+        registry = er.async_get(self._hass)
+        for uid in list(device.emp_entities):
+            entity = device.emp_entities[uid]
+            if not emp.get(uid):
+               del device.emp_entities[uid]
+               if entity.registry_entry:
+                  registry.async_remove(entity.entity_id)
+               else:
+                  self._hass.async_create_task(entity.async_remove())
+               continue
+            if entity._emp != emp[uid]:
+               entity.set_emp(emp[uid])
+            entity.set_missing(uid in device.emp_missing)
+
+        uids = [uid for uid in emp if emp[uid] and not uid in device.emp_entities]
+        if uids:
+           self.add_emp_sensors(device, uids)
+
 class FWIOTDevice:
     def __init__(self, sys: FWIOTSystem, device: any, api_key: any) -> None:
         self._sys = sys
@@ -200,22 +704,78 @@ class FWIOTDevice:
         self._typename = device.get('device_type_name')
         self.inited = False
         ''' this device already add device type entity '''
+        self.timings = FWIOTTimings()
+        ''' rolling timings of updates of this device '''
+        self.emp_entities = {}
+        ''' keypair of userid:employee sensor of a fingerprint machine '''
+        self.emp_missing = {}
+        ''' keypair of userid:complete roster reads in a row without this user '''
+        self._recheck_at = 0
+        ''' position in roster of the next user codes read again '''
         self.manu = device.get('manu','Frontware IOT')
         ''' manufacture  '''
         self._tz =  device.get('tz','')
+        self._tzinfo = finger_tz(pytz.timezone(self._tz or 'Asia/Bangkok')) if self._type == DEVICE_FINGER else None
+        ''' timezone of a fingerprint machine, resolved once '''
         self._last_connect = 0
         ''' last time connect to server to get data '''
+        self._lastid = None
+        ''' highest record id read from server, None = not read yet '''
+        self._history = True
+        ''' records from before the start are still being read, they fire no event '''
+        self._limit = FETCH_LIMIT_MIN
+        ''' number of records asked for in one request '''
         self._every = 5
         ''' update every 5 minutes '''
+        self.set_every(device.get('update','5'))
+
+    def set_every(self, every):
+        ''' set update period in minutes, 5 when not valid '''
         try:
-            self._every = int(device.get('update','5'))
-        except:
-            pass            
+            self._every = int(every)
+        except (TypeError, ValueError):
+            self._every = 5
+        if self._every < 1:
+           self._every = 5
 
     @property
     def type(self):
         return self._type
 
+    def recheck_ids(self):
+        ''' next few known userid to read user code again, in turn '''
+        ids = sorted(self._raw.get('emps') or {})
+        if not ids:
+           return ()
+        at = self._recheck_at % len(ids)
+        self._recheck_at = at + ROSTER_RECHECK
+        return set((ids + ids)[at:at + min(ROSTER_RECHECK, len(ids))])
+
+    @property
+    def cadence(self):
+        ''' time between two updates '''
+        return timedelta(minutes=self._every)
+
+    @property
+    def ttl(self):
+        ''' time last good data is served after it was read '''
+        return max(SNAPSHOT_TTL, 2 * self.cadence)
+
+    @property
+    def stale(self):
+        ''' last good data is too old to be shown '''
+        return datetime.datetime.now().timestamp() > self._last_connect + self.ttl.total_seconds()
+
+    @property
+    def data(self):
+        ''' last data of this device from its coordinator '''
+        data = self.coordinator.data if self.coordinator else None
+        if data is None:
+           return {}
+        if isinstance(self.coordinator, FWIOTHubCoordinator):
+           return data.get(self._key) or {}
+        return data
+
     @property
     def type_name(self):
         return self._typename
@@ -251,7 +811,12 @@ class FWIOTDevice:
     def last_online(self):
         return self._raw.get('last_online', '')
 
-class FWIOTEntity(CoordinatorEntity, Entity):
+def state_ts(state):
+    ''' utc epoch of a restored timestamp state, 0 when not valid '''
+    ts = dt_util.parse_datetime(state.state)
+    return ts.timestamp() if ts else 0
+
+class FWIOTEntity(CoordinatorEntity, RestoreEntity):
     """FWIOT entity."""
     coordinator: FWIOTDataUpdateCoordinator
 
@@ -259,19 +824,60 @@ class FWIOTEntity(CoordinatorEntity, Entity):
         """Initialize the entity."""
         super().__init__(device.coordinator)
         self._device = device
+        self._signature = None
+        ''' state signature last written by coordinator update '''
         #self.async_change = fwiot.coordinator["async_change"]
 
     async def async_added_to_hass(self) -> None:
         """Call when entity is added to hass."""
-        print('FWIOTEntity.async_added_to_hass')
+        # RestoreEntity part only, the listener is added by _async_add_listener
+        await super(CoordinatorEntity, self).async_added_to_hass()
+        self.async_on_remove(self._async_add_listener())
+        await self._async_restore()
+        self._update_from_data()
+        # state is written by hass once added
+        self._signature = self._state_signature()
+
+    @callback
+    def _async_add_listener(self) -> CALLBACK_TYPE:
+        ''' listen to coordinator updates, return the callback removing the listener '''
+        return self.coordinator.async_add_listener(self._handle_coordinator_update)
 
     async def async_will_remove_from_hass(self) -> None:
-        print('FWIOTEntity.async_will_remove_from_hass')
+        LOGGER.debug('Remove entity %s', self.entity_id)
+
+    async def _async_restore(self) -> None:
+        ''' state and last connect of device before restart, shown until the first update '''
+        extra = await self.async_get_last_extra_data()
+        last = (extra.as_dict() if extra else {}).get('last_connect') or 0
+        if last > self._device._last_connect:
+           self._device._last_connect = last
+        state = await self.async_get_last_state()
+        if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+           return
+        try:
+            self._restore_state(state)
+        except (TypeError, ValueError) as err:
+            LOGGER.debug('State of %s not restored: %s', self.entity_id, err)
+
+    @property
+    def extra_restore_state_data(self) -> RestoredExtraData:
+        """Last connect of device, staleness of restored state is known after restart."""
+        return RestoredExtraData({'last_connect': self._device._last_connect})
+
+    @callback
+    def _restore_state(self, state) -> None:
+        ''' set state of this entity from its state before restart '''
 
     @property
     def should_poll(self) -> bool:
-        """No polling needed."""
-        return True
+        """No polling needed, coordinator pushes updates."""
+        return False
+
+    @property
+    def available(self) -> bool:
+        """Data older than the device ttl is not shown."""
+        return super().available and not self._device.stale
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -284,12 +890,25 @@ class FWIOTEntity(CoordinatorEntity, Entity):
             sw_version=self._device.version
         )
 
+    def _state_signature(self):
+        ''' what is written for this entity, to tell if it changed '''
+        return (self.available, self.state, self.icon,
+                tuple(sorted((self.extra_state_attributes or {}).items())))
+
+    @callback
+    def _update_from_data(self) -> None:
+        ''' set state of this entity from coordinator data '''
+
     @callback
     def _handle_coordinator_update(self) -> None:
-        """Handle data update."""
-        
-        print('handle_coordinator_update')
-        self.async_write_ha_state()
+        """Handle data update, write state only when it changed."""
+        self._update_from_data()
+        sign = self._state_signature()
+        if sign == self._signature:
+           return
+        self._signature = sign
+        with self._device.timings.span('state'):
+           self.async_write_ha_state()
 
 
 class FWIOTDeviceStatus(FWIOTEntity):
@@ -304,10 +923,14 @@ class FWIOTDeviceStatus(FWIOTEntity):
         """Return"""
         return f"{self._device.status}"
 
-    async def async_update(self):
-        if self.coordinator.data.get('status', False):
-           self._device._raw['status'] = self.coordinator.data.get('status', {}).get('status')
-        self.async_write_ha_state()   
+    @callback
+    def _restore_state(self, state) -> None:
+        self._device._raw['status'] = state.state
+
+    @callback
+    def _update_from_data(self) -> None:
+        if self._device.data.get('status', False):
+           self._device._raw['status'] = self._device.data.get('status', {}).get('status')
 
     @property
     def icon(self):
@@ -328,9 +951,14 @@ class FWIOTDeviceLastOnline(FWIOTEntity):
         """Return"""
         return datetime.datetime.fromtimestamp(self._device.last_online,tz=pytz.UTC) if self._device.last_online else None
 
-    async def async_update(self):
-        self._device._raw['last_online'] = self.coordinator.data.get('status', {}).get('ts', False)
-        self.async_write_ha_state()
+    @callback
+    def _restore_state(self, state) -> None:
+        self._device._raw['last_online'] = state_ts(state)
+
+    @callback
+    def _update_from_data(self) -> None:
+        if self._device.data.get('status', False):
+           self._device._raw['last_online'] = self._device.data.get('status', {}).get('ts', False)
 
 class FWIOTDeviceType(FWIOTEntity):
     """A device type implementation for device."""
@@ -339,6 +967,10 @@ class FWIOTDeviceType(FWIOTEntity):
         self._attr_unique_id = f"{self._device.unique_id}_type"
         self._attr_name = "device's type"
 
+    @property
+    def available(self) -> bool:
+        return True
+
     @property
     def state(self):
         """Return"""
@@ -358,10 +990,13 @@ class FWDeviceLastCrawl(FWIOTEntity):
         self._attr_unique_id = f"{self._device.unique_id}_last_c"
         self._attr_name = "last connect"
 
+    @property
+    def available(self) -> bool:
+        """Time of last good data, shown even when it is stale."""
+        return True
+
     @property
     def state(self):
         """Return"""
         return datetime.datetime.fromtimestamp(self._device._last_connect,tz=pytz.UTC) if self._device._last_connect else None
-
-    async def async_update(self):
-        pass        
\ No newline at end of file
+        
\ No newline at end of file
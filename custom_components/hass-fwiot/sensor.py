@@ -7,7 +7,7 @@ import json
 from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.const import (
     DEVICE_CLASS_TIMESTAMP,
@@ -21,7 +21,7 @@ from homeassistant.components.sensor import (
 )
 from .const import DEVICE_FINGER, DOMAIN, DEVICE_EMPDETECTOR, DEVICE_THERMIDITY
 from . import async_add_sensors
-from .fwiot import FWIOTDevice, FWIOTEntity
+from .fwiot import FWIOTDevice, FWIOTEntity, state_ts
 
 # This function is called as part of the __init__.async_setup_entry (via the
 # hass.config_entries.async_forward_entry_setup call)
@@ -32,6 +32,18 @@ async def async_setup_entry(
 ) -> None:
     async_add_sensors(hass, async_add_entities, add_sensor_fn)
 
+    @callback
+    def add_emp_sensors(device, uids):
+        ''' add sensors for new employees of a fingerprint machine '''
+        async_add_entities([emp_sensor(device, each) for each in uids])
+
+    hass.data[DOMAIN].add_emp_sensors = add_emp_sensors
+
+def emp_sensor(device, empid):
+    ''' sensor of one employee, kept in device '''
+    sensor = device.emp_entities[empid] = FWBiometricEmployeeName(device, device._raw['emps'][empid], empid)
+    return sensor
+
 def add_sensor_fn(device, rets):
     ''' add sensors for employee detector '''
 
@@ -44,8 +56,8 @@ def add_sensor_fn(device, rets):
     elif device.type == DEVICE_FINGER:
         for each in device._raw.get('emps', {}):
             n = device._raw.get('emps', {})[each]
-            if n:
-               rets.append(FWBiometricEmployeeName(device, n, each))
+            if n and not each in device.emp_entities:
+               rets.append(emp_sensor(device, each))
 
 class FWIOTEmployeeUpdate(FWIOTEntity):
     
@@ -63,8 +75,14 @@ class FWIOTEmployeeUpdate(FWIOTEntity):
         """Return"""
         return datetime.datetime.fromtimestamp(self._tdetected,tz=pytz.UTC) if self._tdetected else None
 
-    async def async_update(self):
-        self._tdetected = self.coordinator.data.get('data', {}).get('ts', False)
+    @callback
+    def _restore_state(self, state) -> None:
+        self._tdetected = state_ts(state)
+
+    @callback
+    def _update_from_data(self) -> None:
+        if self._device.data.get('data', False):
+           self._tdetected = self._device.data.get('data', {}).get('ts', False)
 
 class FWIOTEmployeeName(FWIOTEntity):
     
@@ -80,8 +98,14 @@ class FWIOTEmployeeName(FWIOTEntity):
         """Return"""
         return self._edetected
 
-    async def async_update(self):
-        self._edetected = self.coordinator.data.get('data', {}).get('employee', '-')
+    @callback
+    def _restore_state(self, state) -> None:
+        self._edetected = state.state
+
+    @callback
+    def _update_from_data(self) -> None:
+        if self._device.data.get('data', False):
+           self._edetected = self._device.data.get('data', {}).get('employee', '-')
 
     @property
     def icon(self):
@@ -109,8 +133,14 @@ class FWIOTTemperature(FWIOTEntity):
         """Return"""
         return self._temp
 
-    async def async_update(self):
-        self._temp = self.coordinator.data.get('data', {}).get('temp', 0)
+    @callback
+    def _restore_state(self, state) -> None:
+        self._temp = float(state.state)
+
+    @callback
+    def _update_from_data(self) -> None:
+        if self._device.data.get('data', False):
+           self._temp = self._device.data.get('data', {}).get('temp', 0)
 
 class FWIOTHumudity(FWIOTEntity):
     """Representation of a Sensor."""
@@ -134,8 +164,14 @@ class FWIOTHumudity(FWIOTEntity):
         """Return"""
         return self._hum
 
-    async def async_update(self):        
-        self._hum = self.coordinator.data.get('data', {}).get('hum', 0)
+    @callback
+    def _restore_state(self, state) -> None:
+        self._hum = float(state.state)
+
+    @callback
+    def _update_from_data(self) -> None:
+        if self._device.data.get('data', False):
+           self._hum = self._device.data.get('data', {}).get('hum', 0)
 
 class FWBiometricEmployeeName(FWIOTEntity):
 
@@ -147,17 +183,50 @@ class FWBiometricEmployeeName(FWIOTEntity):
         self._attr_unique_id = f"{self._device.unique_id}_b_{empid}"
         self._attr_name = f" {emp}"
         self._emp = emp
+        self._empid = empid
         self._last = 0
+        self._missing = False
+        ''' user not in the last roster read, removed when known gone '''
 
     @property
     def state(self):
         """Return"""
         return datetime.datetime.fromtimestamp(self._last,tz=pytz.UTC) if self._last else None
 
-    async def async_update(self):
-        if not self.coordinator.data.get(self._emp, {}):
+    @callback
+    def set_emp(self, emp: str) -> None:
+        ''' user code of this employee changed on the machine '''
+        self._emp = emp
+        self._attr_name = f" {emp}"
+        if self.hass:
+           self.async_write_ha_state()
+
+    @callback
+    def set_missing(self, missing: bool) -> None:
+        ''' user not in the last roster read, unavailable until it is back or removed '''
+        if missing == self._missing:
+           return
+        self._missing = missing
+        if self.hass:
+           self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Not shown while the user is missing from the roster."""
+        return super().available and not self._missing
+
+    @callback
+    def _async_add_listener(self) -> CALLBACK_TYPE:
+        ''' listen to logs of this employee only, coordinator calls back when this user has a new log '''
+        return self.coordinator.async_add_uid_listener(self._empid, self._handle_coordinator_update)
+
+    @callback
+    def _restore_state(self, state) -> None:
+        self._last = state_ts(state)
+
+    @callback
+    def _update_from_data(self) -> None:
+        if not self._device.data.get(self._empid, 0):
            return
-        # get local timezone
-        self._last = pytz.timezone( self._device._tz or 'Asia/Bangkok').localize(
-            datetime.datetime.strptime(self.coordinator.data.get(self._emp, {}), '%d/%m/%Y %H:%M:%S'),is_dst=None
-        ).astimezone(pytz.utc).timestamp()
\ No newline at end of file
+        # utc epoch, already converted from the machine timezone
+        self._last = self._device.data.get(self._empid)